@@ -0,0 +1,393 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from ledger_schema import Layout, clear_frame_cache
+from ledger_store import ISO_DATE, CsvLedgerStore, open_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+INCOME_CATEGORIES = ["Salary", "Investments", "Other"]
+EXPENSE_CATEGORIES = ["Food", "Rent", "Bills", "Entertainment", "Misc", "Travel", "Shopping", "Health"]
+
+# The Streamlit app's ledger layout (see hisaab_kitaab.py).
+STREAMLIT_COLUMNS = ["Type", "Category", "Amount", "Date", "Description", "Username", "Id"]
+STREAMLIT_DATE_FORMAT = "%d/%m/%Y"
+STREAMLIT_SHARD_DIR = "ledgers"
+
+SUITES = ["startup", "cli", "tk", "streamlit", "append"]
+BACKENDS = ["csv", "wal", "sqlite", "partitioned", "parquet"]
+
+# Modules the quick paths must not import, and how long importing each
+# front-end may take in a fresh interpreter (seconds).
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "pyarrow"]
+STARTUP_BUDGETS = {"main": 0.1, "ui_app": 0.15}
+
+
+# ---------- SYNTHETIC LEDGERS ----------
+def generate_rows(count, users=1, seed=0, start=date(2020, 1, 1), days=5 * 365):
+    """`count` reproducible transactions spread over `days` days and `users` users."""
+    rng = random.Random(seed)
+    for i in range(count):
+        if rng.random() < 0.15:
+            t_type, category, amount = "income", rng.choice(INCOME_CATEGORIES), rng.uniform(1000, 50000)
+        else:
+            t_type, category, amount = "expense", rng.choice(EXPENSE_CATEGORIES), rng.uniform(10, 5000)
+        yield {
+            "type": t_type,
+            "category": category,
+            "amount": round(amount, 2),
+            "date": start + timedelta(days=rng.randrange(days)),
+            "description": f"txn {i}",
+            "username": f"user{rng.randrange(users)}",
+            # Deterministic ids keep generated files byte-identical per seed.
+            "id": f"B{i:025d}",
+        }
+
+
+def write_ledger(path, count, users=1, seed=0, columns=None, date_format=ISO_DATE, chunk_size=100_000):
+    """Stream a synthetic ledger to the CSV at `path`; memory stays flat up to 10M rows."""
+    store = CsvLedgerStore(path, columns=columns, date_format=date_format, running_totals=False)
+    rows = generate_rows(count, users, seed)
+    layout = Layout(store.columns, date_format)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(store.columns)
+        while True:
+            chunk = [store.row_values(row, layout) for _, row in zip(range(chunk_size), rows)]
+            if not chunk:
+                break
+            writer.writerows(chunk)
+    return path
+
+
+# ---------- TIMING ----------
+def timed(fn, repeat, setup=None):
+    """Run `fn` `repeat` times; `setup` runs before each one, off the clock."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_s": ordered[0],
+        "median_s": statistics.median(ordered),
+        "p95_s": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max_s": ordered[-1],
+    }
+
+
+def _remove_sidecars(path):
+    for suffix in (".totals.json", ".totals.days.json", ".totals.days.log", ".wal", ".version", ".lock"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+# ---------- SUITES ----------
+def bench_cli(workdir, rows, users, seed, repeat):
+    import main
+
+    path = write_ledger(os.path.join(workdir, "cli.csv"), rows, users, seed)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.view_summary()
+
+    def cold():
+        # No parse cache and no running-totals sidecar: the first summary.
+        _remove_sidecars(path)
+        clear_frame_cache()
+        main.store = open_store(path)
+
+    results = {"cli.view_summary.cold": timed(run, repeat, setup=cold)}
+    main.store = open_store(path)
+    run()
+    results["cli.view_summary.warm"] = timed(run, repeat)
+    return results
+
+
+def bench_tk(workdir, rows, users, seed, repeat):
+    import tkinter as tk
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as exc:
+        return {"tk.view_summary": {"skipped": f"no display: {exc}"}}
+    root.withdraw()
+
+    import ui_app
+    from ledger_watch import LedgerWatcher
+
+    path = write_ledger(os.path.join(workdir, "tk.csv"), rows, users, seed)
+    app = ui_app.BudgetTrackerApp(root, path, "bench")
+    # The picker reads "January 2024"; generated rows span 2020-2024.
+    app.month_var.set(datetime(2024, 1, 1).strftime("%B %Y"))
+
+    def run():
+        # The summary is built on a worker thread; wait until it is on screen.
+        app.view_summary()
+        while app.shown != app.requested:
+            root.update()
+            time.sleep(0.001)
+
+    def cold():
+        _remove_sidecars(path)
+        clear_frame_cache()
+        app.watcher.stop()
+        app.watcher = LedgerWatcher(open_store(path))
+        app._summaries.clear()
+
+    try:
+        results = {"tk.view_summary.cold": timed(run, repeat, setup=cold)}
+        results["tk.view_summary.warm"] = timed(run, repeat)
+    finally:
+        root.destroy()
+    return results
+
+
+def bench_streamlit(workdir, rows, users, seed, repeat):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    from ledger_shards import shard_flat_file
+
+    app_dir = os.path.join(workdir, "streamlit")
+    os.makedirs(app_dir, exist_ok=True)
+    path = os.path.join(app_dir, "transactions.csv")
+    write_ledger(path, rows, users, seed, STREAMLIT_COLUMNS, STREAMLIT_DATE_FORMAT)
+    # Split up front, as the app does on its first start, so the timings
+    # below are for the per-user shards.
+    shard_flat_file(path, os.path.join(app_dir, STREAMLIT_SHARD_DIR), STREAMLIT_COLUMNS, STREAMLIT_DATE_FORMAT)
+    script = os.path.join(BASE_DIR, "hisaab_kitaab.py")
+
+    results = {}
+    cwd = os.getcwd()
+    # The app opens transactions.csv relative to where it runs.
+    os.chdir(app_dir)
+    try:
+        def fresh():
+            st.cache_data.clear()
+            st.cache_resource.clear()
+            clear_frame_cache()
+
+        def load():
+            AppTest.from_file(script, default_timeout=600).run()
+
+        results["streamlit.load.cold"] = timed(load, repeat, setup=fresh)
+        results["streamlit.load.warm"] = timed(load, repeat)
+
+        app = AppTest.from_file(script, default_timeout=600).run()
+        results["streamlit.filter_user"] = timed(lambda: app.text_input[0].input("user0").run(), repeat)
+        app.number_input[0].set_value(100.0).run()
+
+        def save():
+            # Widgets are looked up again each run: the tree is rebuilt on every rerun.
+            next(b for b in app.button if b.label.startswith("💾")).click().run()
+
+        results["streamlit.save"] = timed(save, repeat)
+    finally:
+        os.chdir(cwd)
+        st.cache_resource.clear()
+    return results
+
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter() - started
+{action}
+print(json.dumps({{"import_s": imported, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# `python main.py` for one quick entry: import, then append a row.
+ADD_ACTION = """
+main.store = main.open_store(sys.argv[1])
+main.store.append({"type": "expense", "category": "Food", "amount": 1.0,
+                   "date": "2025-01-01", "description": "startup"})
+"""
+
+
+def bench_startup(workdir, repeat):
+    """Import time of each front-end, and which heavy modules it pulled in."""
+    runs = {f"startup.{module}": (module, "", None) for module in STARTUP_BUDGETS}
+    ledger = os.path.join(workdir, "startup.csv")
+    runs["startup.main.add"] = ("main", ADD_ACTION, ledger)
+    results = {}
+    for name, (module, action, arg) in runs.items():
+        code = STARTUP_SCRIPT.format(module=module, action=action, heavy=HEAVY_MODULES)
+        samples, heavy = [], []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", code] + ([arg] if arg else []), cwd=BASE_DIR,
+                                 capture_output=True, text=True, check=True).stdout
+            measured = json.loads(out.strip().splitlines()[-1])
+            samples.append(measured["import_s"])
+            heavy = measured["heavy"]
+        results[name] = dict(summarize(samples), heavy=heavy, budget_s=STARTUP_BUDGETS[module])
+    return results
+
+
+def check_startup(repeat=3):
+    """Problems with the startup budget, as messages; empty when within it."""
+    with tempfile.TemporaryDirectory(prefix="hk_startup_") as workdir:
+        results = bench_startup(workdir, repeat)
+    problems = []
+    for name, result in results.items():
+        if result["median_s"] > result["budget_s"]:
+            problems.append(f"{name}: import took {result['median_s'] * 1000:.0f} ms, "
+                            f"budget is {result['budget_s'] * 1000:.0f} ms")
+        if result["heavy"]:
+            problems.append(f"{name}: imported {', '.join(result['heavy'])}")
+    return problems
+
+
+def _open_backend(backend, workdir, rows, users, seed):
+    flat = write_ledger(os.path.join(workdir, f"append_{backend}.csv"), rows, users, seed)
+    if backend == "csv":
+        return CsvLedgerStore(flat)
+    if backend == "wal":
+        from ledger_wal import WalLedgerStore
+
+        return WalLedgerStore(CsvLedgerStore(flat))
+    if backend == "sqlite":
+        store = open_store(flat, backend="sqlite")
+        store.extend(generate_rows(rows, users, seed))
+        return store
+    if backend == "partitioned":
+        from ledger_partitions import migrate_flat_file
+
+        migrate_flat_file(flat, os.path.join(workdir, "append_partitioned"))
+        return open_store(os.path.join(workdir, "append_partitioned"))
+    if backend == "parquet":
+        from ledger_parquet import convert
+
+        dest = os.path.join(workdir, "append.parquet")
+        convert(flat, dest)
+        return open_store(dest)
+    raise ValueError(f"Unknown backend: {backend!r}")
+
+
+def bench_append(workdir, rows, users, seed, appends, backends):
+    results = {}
+    for backend in backends:
+        try:
+            store = _open_backend(backend, workdir, rows, users, seed)
+        except ImportError as exc:
+            results[f"append.{backend}"] = {"skipped": str(exc)}
+            continue
+        new_rows = generate_rows(appends, users, seed + 1)
+        samples = []
+        for row in new_rows:
+            row.pop("id")
+            row["date"] = date.today()
+            started = time.perf_counter()
+            store.append(row)
+            samples.append(time.perf_counter() - started)
+        if hasattr(store, "close"):
+            store.close()
+        results[f"append.{backend}"] = summarize(samples)
+    return results
+
+
+# ---------- RUNNER ----------
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, users=50, seed=42, repeat=5, appends=200, suites=SUITES, backends=BACKENDS[:3], workdir=None):
+    """Run the chosen suites at every ledger size; returns a JSON-ready report."""
+    import pandas as pd
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "users": users,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": {},
+    }
+    if "startup" in suites:
+        with tempfile.TemporaryDirectory(prefix="hk_startup_", dir=workdir) as scratch:
+            report["results"]["startup"] = bench_startup(scratch, repeat)
+    for rows in sizes:
+        scratch = tempfile.mkdtemp(prefix=f"hk_bench_{rows}_", dir=workdir)
+        try:
+            results = {}
+            if "cli" in suites:
+                results.update(bench_cli(scratch, rows, users, seed, repeat))
+            if "tk" in suites:
+                results.update(bench_tk(scratch, rows, users, seed, repeat))
+            if "streamlit" in suites:
+                results.update(bench_streamlit(scratch, rows, users, seed, repeat))
+            if "append" in suites:
+                results.update(bench_append(scratch, rows, users, seed, appends, backends))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        report["results"][str(rows)] = results
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the ledger read and write paths on synthetic ledgers.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000],
+                        help="ledger sizes to run, e.g. 10000 1000000 10000000")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timed read")
+    parser.add_argument("--appends", type=int, default=200, help="single-row appends per backend")
+    parser.add_argument("--only", default=",".join(SUITES), help=f"comma-separated suites: {','.join(SUITES)}")
+    parser.add_argument("--backends", default=",".join(BACKENDS[:3]),
+                        help=f"append backends: {','.join(BACKENDS)}")
+    parser.add_argument("--workdir", help="where scratch ledgers go (default: the system temp dir)")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--check-startup", action="store_true",
+                        help="only check the import-time budget; exits 1 if it is exceeded")
+    args = parser.parse_args()
+
+    if args.check_startup:
+        problems = check_startup()
+        for problem in problems:
+            print(f"⚠️ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✅ Startup within budget")
+        sys.exit(0)
+
+    report = run(args.rows, args.users, args.seed, args.repeat, args.appends,
+                 args.only.split(","), args.backends.split(","), args.workdir)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        print(f"✅ Benchmark report written to {args.out}")
+    else:
+        print(text)
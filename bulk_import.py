@@ -0,0 +1,149 @@
+import argparse
+import csv
+import os
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from ledger_store import CLI_COLUMNS, ISO_DATE, open_store
+
+CHUNK_SIZE = 5000
+
+# Header spellings seen in bank CSV exports, matched case-insensitively.
+HEADER_ALIASES = {
+    "date": ["date", "txn date", "transaction date", "value date", "posting date"],
+    "description": ["description", "narration", "particulars", "details", "remarks"],
+    "amount": ["amount", "transaction amount", "amount (inr)"],
+    "debit": ["debit", "withdrawal", "withdrawal amt.", "withdrawal amount", "debit amount"],
+    "credit": ["credit", "deposit", "deposit amt.", "deposit amount", "credit amount"],
+    "type": ["type", "dr/cr", "cr/dr", "transaction type"],
+    "category": ["category"],
+}
+INCOME_WORDS = {"cr", "credit", "deposit", "income"}
+EXPENSE_WORDS = {"dr", "debit", "withdrawal", "expense"}
+DEFAULT_CATEGORY = {"income": "Other", "expense": "Misc"}
+
+
+# ---------- COLUMN MAPPING ----------
+def detect_mapping(header, overrides=None):
+    """Ledger field -> source column, guessed from the header, then `overrides`."""
+    lowered = {h.strip().lower(): h for h in header if h}
+    mapping = {}
+    for field, aliases in HEADER_ALIASES.items():
+        match = next((lowered[a] for a in aliases if a in lowered), None)
+        if match is not None:
+            mapping[field] = match
+    mapping.update(overrides or {})
+    if "date" not in mapping or not ("amount" in mapping or {"debit", "credit"} <= mapping.keys()):
+        raise ValueError(f"Cannot find date/amount columns in {list(header)}; pass them with --map")
+    return mapping
+
+
+def _amount(text):
+    text = (text or "").replace(",", "").replace("₹", "").strip()
+    return float(text) if text else 0.0
+
+
+def map_row(raw, mapping, date_format):
+    """One export row -> ledger row, or None if it cannot be read."""
+    try:
+        date = datetime.strptime((raw.get(mapping["date"]) or "").strip(), date_format).date()
+        if "amount" in mapping:
+            amount = _amount(raw.get(mapping["amount"]))
+            word = (raw.get(mapping.get("type")) or "").strip().lower()
+            if word in INCOME_WORDS:
+                t_type = "income"
+            elif word in EXPENSE_WORDS:
+                t_type = "expense"
+            else:
+                t_type = "expense" if amount < 0 else "income"
+        else:
+            debit, credit = _amount(raw.get(mapping["debit"])), _amount(raw.get(mapping["credit"]))
+            amount, t_type = (debit, "expense") if debit else (credit, "income")
+    except ValueError:
+        return None
+    if not amount:
+        return None
+    category = (raw.get(mapping.get("category")) or "").strip() or DEFAULT_CATEGORY[t_type]
+    return {"type": t_type, "category": category, "amount": round(abs(amount), 2),
+            "date": date, "description": (raw.get(mapping.get("description")) or "").strip()}
+
+
+# ---------- DEDUPE ----------
+def _key(date, t_type, amount, description):
+    return date, t_type, round(float(amount), 2), str(description).strip()
+
+
+def existing_keys(store, username=None):
+    # A Counter, so a statement with three identical rows against two
+    # already in the ledger still imports the third.
+    df = store.read(username)
+    dates = df["date"].dt.strftime(ISO_DATE).fillna("")
+    return Counter(_key(*row) for row in zip(dates, df["type"], df["amount"].fillna(0),
+                                              df["description"].fillna("")))
+
+
+# ---------- IMPORT ----------
+def bulk_import(source_path, store, mapping=None, date_format="%d/%m/%Y",
+                chunk_size=CHUNK_SIZE, username=None, dedupe=True):
+    """Stream a bank export into `store`, `chunk_size` rows per append.
+
+    Only one chunk of the export is held at a time; the dedupe counter is
+    sized by the existing ledger, not by the export.
+    """
+    stats = {"read": 0, "imported": 0, "duplicates": 0, "skipped": 0}
+    existing = existing_keys(store, username) if dedupe else Counter()
+
+    with open(source_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        mapping = detect_mapping(reader.fieldnames or [], mapping)
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                break
+            batch = []
+            for raw in chunk:
+                stats["read"] += 1
+                row = map_row(raw, mapping, date_format)
+                if row is None:
+                    stats["skipped"] += 1
+                    continue
+                key = _key(row["date"].strftime(ISO_DATE), row["type"], row["amount"], row["description"])
+                if existing[key] > 0:
+                    existing[key] -= 1
+                    stats["duplicates"] += 1
+                    continue
+                if username:
+                    row["username"] = username
+                batch.append(row)
+            store.extend(batch)
+            stats["imported"] += len(batch)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a bank statement CSV into a ledger.")
+    parser.add_argument("source", help="bank export to import")
+    parser.add_argument("--ledger", default=os.path.join("data", "transactions.csv"))
+    parser.add_argument("--ledger-columns", default=",".join(CLI_COLUMNS),
+                        help="ledger CSV header, e.g. Type,Category,Amount,Date,Description,Username")
+    parser.add_argument("--ledger-date-format", default=ISO_DATE)
+    parser.add_argument("--date-format", default="%d/%m/%Y", help="date format used by the export")
+    parser.add_argument("--map", action="append", default=[], metavar="FIELD=COLUMN",
+                        help="map a ledger field (date, description, amount, debit, credit, type, "
+                             "category) to an export column")
+    parser.add_argument("--user", help="username to tag rows with (shared ledgers)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--no-dedupe", action="store_true")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.map)
+    store = open_store(args.ledger, columns=args.ledger_columns.split(","),
+                       date_format=args.ledger_date_format)
+    try:
+        stats = bulk_import(args.source, store, overrides, args.date_format,
+                            args.chunk_size, args.user, not args.no_dedupe)
+    except (OSError, ValueError) as exc:
+        parser.exit(1, f"⚠️ Import failed: {exc}\n")
+    print(f"✅ Imported {stats['imported']} of {stats['read']} rows "
+          f"({stats['duplicates']} duplicates, {stats['skipped']} unreadable)")
@@ -1,36 +1,177 @@
+import json
+import os
+import threading
+
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import os
 from datetime import datetime
 
+from ledger_budgets import CATEGORIES, BudgetMonitor, Budgets
+from ledger_metrics import enable_from_argv, is_enabled, last_breakdown, operation, snapshot, timed, to_prometheus
+from ledger_model import Ledger, month_range
+from ledger_queue import WriteBehindLedgerStore
+from ledger_search import LedgerSearch
+from ledger_shards import ShardedLedgerStore, shard_flat_file, shard_name
+from ledger_store import CsvLedgerStore, open_store
+from ledger_totals import GRANULARITIES, MONTH_ABBRS, series, year_over_year
+from ledger_wal import WalLedgerStore
+
 # -------------------- PAGE CONFIG --------------------
 st.set_page_config(page_title="💰 Hisaab-Kitaab", page_icon="📖", layout="centered")
+# HK_PROFILE=1, or `streamlit run hisaab_kitaab.py -- --profile`, times each run.
+enable_from_argv()
 
 # -------------------- FILE HANDLING --------------------
 DATA_FILE = "transactions.csv"
-expected_cols = ["Type", "Category", "Amount", "Date", "Description", "Username"]
+# One ledger per user, ledgers/<user>_transactions.csv, found through
+# ledgers/users.json; DATA_FILE is only read once, to split it up.
+SHARD_DIR = "ledgers"
+DATE_FORMAT = "%d/%m/%Y"
+expected_cols = ["Type", "Category", "Amount", "Date", "Description", "Username", "Id"]
+PAGE_SIZES = [25, 50, 100, 200]
+SEARCH_LIMIT = 50
+# Seconds the save button waits for its row to reach the disk.
+SAVE_WAIT = 2.0
+
+
+def open_shard(path):
+    # Each shard's saves, deletes and clears go through its own write-ahead
+    # log, and saves are written behind: the button returns before the disk
+    # is touched. Anything that reads the shard waits for its queue first.
+    base = open_store(path, columns=expected_cols, date_format=DATE_FORMAT)
+    return WriteBehindLedgerStore(WalLedgerStore(base) if isinstance(base, CsvLedgerStore) else base)
+
+
+# One store per server process, shared by every session.
+@st.cache_resource
+def get_store():
+    sharded = ShardedLedgerStore(SHARD_DIR, columns=expected_cols, date_format=DATE_FORMAT,
+                                 shard_factory=open_shard)
+    if not sharded.users() and os.path.exists(DATA_FILE):
+        # First start on a shared ledger: fold its log in and split it by user.
+        shared = WalLedgerStore(CsvLedgerStore(DATA_FILE, columns=expected_cols, date_format=DATE_FORMAT))
+        shared.compact()
+        shared.close()
+        shard_flat_file(DATA_FILE, SHARD_DIR, expected_cols, DATE_FORMAT)
+    return sharded
+
+
+store = get_store()
+
+
+class ShardCache:
+    """The compact Ledger of one shard, as of `fingerprint`, and what is built on it.
+
+    Only the current version is kept. A save made by this server is
+    appended to the Ledger in place (`add`); any other change to the shard
+    parses it again. Views (a user's rows, or one month of them, with the
+    date index history pages walk) and rollups are built once per version
+    and shared by every session: never append to one.
+    """
+
+    def __init__(self, shard):
+        self.shard = shard
+        self.fingerprint = None
+        self.ledger = None
+        self.views = {}
+        self.rollups = {}
+        # Held while the Ledger is read or appended to: appends resize its arrays.
+        self.lock = threading.Lock()
+
+    def _at(self, fingerprint):
+        if self.ledger is None or fingerprint != self.fingerprint:
+            self.ledger = Ledger.from_frame(self.shard.read())
+            self.fingerprint = fingerprint
+            self.views, self.rollups = {}, {}
+        return self.ledger
+
+    def _view(self, fingerprint, username, month=None):
+        ledger = self._at(fingerprint)
+        if (username, month) not in self.views:
+            start, end = month_range(month) if month is not None else (None, None)
+            view = ledger.filter(username=username, start=start, end=end)
+            view.date_index()
+            self.views[(username, month)] = view
+        return self.views[(username, month)]
+
+    def view(self, fingerprint, username, month=None):
+        with self.lock:
+            return self._view(fingerprint, username, month)
+
+    def rollup(self, fingerprint, username, granularity):
+        with self.lock:
+            view = self._view(fingerprint, username)
+            if (username, granularity) not in self.rollups:
+                self.rollups[(username, granularity)] = view.rollup(granularity)
+            return self.rollups[(username, granularity)]
+
+    def add(self, rows, since, fingerprint):
+        """Append rows this server wrote between `since` and `fingerprint`; False if the cache was not at `since`."""
+        with self.lock:
+            if self.ledger is None or since != self.fingerprint:
+                return False
+            for row in rows:
+                self.ledger.append(row)
+            self.fingerprint = fingerprint
+            self.views, self.rollups = {}, {}
+            return True
+
+    def refresh(self, search, fingerprint):
+        # An in-memory index rebuilds from the Ledger when it is current.
+        with self.lock:
+            current = self.ledger is not None and fingerprint == self.fingerprint
+            return search.refresh(self.ledger if current else None, fingerprint if current else None)
+
+
+# One ShardCache per shard, shared by every session of that user rather
+# than copied into each; a page only ever works on a filtered copy.
+@st.cache_resource(show_spinner=False, max_entries=64)
+def get_cache(_shard, path):
+    return ShardCache(_shard)
+
+
+# One description index per shard, shared by every session like the Ledger.
+# Saves add their row to it; anything else makes it re-index the Ledger.
+@st.cache_resource(show_spinner=False, max_entries=64)
+def get_search(_shard, path):
+    return LedgerSearch(_shard)
+
+
+# Each user's monthly limits sit next to their shard, shared by every session.
+@st.cache_resource(show_spinner=False, max_entries=64)
+def get_budgets(username):
+    return Budgets(os.path.join(SHARD_DIR, shard_name(username)))
+
+
+def save_transaction(row):
+    # Queued for the user's shard; once written, the caller adds the row to
+    # the shard's cache.
+    return store.append(row)
 
-# Load data safely
-if os.path.exists(DATA_FILE):
-    try:
-        df = pd.read_csv(DATA_FILE)
-        if df.empty or list(df.columns) != expected_cols:
-            df = pd.DataFrame(columns=expected_cols)
-    except Exception:
-        df = pd.DataFrame(columns=expected_cols)
-else:
-    df = pd.DataFrame(columns=expected_cols)
 
 # -------------------- APP HEADER --------------------
 st.title("💰 Hisaab-Kitaab — Personal Budget Tracker")
 
 # -------------------- USER INPUT --------------------
 username = st.text_input("Enter your name to continue:")
+page_run = operation("page", shard_name(username) if username else "").start()
 
 if username:
-    user_exists = username in df["Username"].values if not df.empty else False
-    if user_exists:
+    # Only this user's shard is read; other users never cost this session anything.
+    shard = store.shard(username)
+    fingerprint = shard.fingerprint() if shard is not None else None
+    # Rows saved on the last run are on disk now: index them as of the
+    # fingerprint from before that save.
+    saved = st.session_state.pop("unindexed", None)
+    if saved is not None and shard is not None and saved[0] == shard.path:
+        get_search(shard, shard.path).add(saved[2], saved[1])
+    cache = get_cache(shard, shard.path) if shard is not None else None
+    try:
+        user_ledger = cache.view(fingerprint, username) if cache is not None else Ledger()
+    except Exception:
+        user_ledger = Ledger()
+    if len(user_ledger):
         st.subheader(f"Welcome back, {username.capitalize()}!")
     else:
         st.subheader(f"Welcome, {username.capitalize()}!")
@@ -39,36 +180,89 @@ if username:
     st.header("➕ Add New Transaction")
 
     t_type = st.selectbox("Type", ["Income", "Expense"])
-    category = st.selectbox(
-        "Category",
-        ["Salary", "Food", "Travel", "Shopping", "Bills", "Health", "Other"]
-    )
+    category = st.selectbox("Category", CATEGORIES[t_type.lower()])
     amount = st.number_input("Amount (₹)", min_value=0.0, format="%.2f")
     date = st.date_input("Date", datetime.now())
     desc = st.text_input("Description")
 
+    budgets = get_budgets(username)
+    # Budget checks go through one monitor per session: it sums a month and
+    # category of this run's rows once, then counts the session's own saves,
+    # so a save never re-aggregates the ledger. It starts over when someone
+    # else changed the shard since its last save.
+    held = st.session_state.get("budget_monitor")
+    if held is None or held[0] != (username, fingerprint):
+        held = ((username, fingerprint), BudgetMonitor(budgets, user_ledger, username))
+        st.session_state.budget_monitor = held
+    monitor = held[1]
+
     if st.button("💾 Save Transaction"):
-        new_data = pd.DataFrame([[t_type, category, amount, date.strftime("%d/%m/%Y"), desc, username]],
-                                columns=expected_cols)
-        df = pd.concat([df, new_data], ignore_index=True)
-        df.to_csv(DATA_FILE, index=False)
-        st.success("Transaction saved successfully!")
+        row = {"type": t_type, "category": category, "amount": amount,
+               "date": date, "description": desc, "username": username}
+        new_id = save_transaction(row)
+        # The queue writes within milliseconds; waiting for it here means a
+        # row it had to drop is reported as such, never as saved.
+        queue = store.shard(username)
+        written = queue.flush(timeout=SAVE_WAIT)
+        failure = queue.failed.get(new_id)
+        if failure is not None:
+            st.error(f"❌ Transaction could not be saved: {failure}")
+        else:
+            if shard is not None:
+                st.session_state.unindexed = (shard.path, fingerprint, [dict(row, id=new_id)])
+            after = queue.fingerprint() if written else None
+            if cache is not None and written and cache.add([dict(row, id=new_id)], fingerprint, after):
+                fingerprint = after
+                user_ledger = cache.view(fingerprint, username)
+            else:
+                fingerprint = None  # older than the shard now
+                user_ledger = user_ledger.filter()  # a copy: the cached view is shared
+                user_ledger.append(dict(row, id=new_id))
+            if written:
+                st.success("Transaction saved successfully!")
+            else:
+                reason = f": {queue.error}" if isinstance(queue.error, OSError) else ""
+                st.warning(f"⏳ Transaction queued but not written yet{reason}. It will be retried.")
+            alert = monitor.add(row)
+            # The shard as this save left it: the monitor still holds for the next run.
+            st.session_state.budget_monitor = ((username, after or queue.fingerprint()), monitor)
+            if alert is not None:
+                (st.error if alert.over else st.warning)(str(alert))
+
+    with st.expander("🎯 Monthly Budgets"):
+        this_month = datetime.now().strftime("%Y-%m")
+        limits = budgets.limits(username)
+        for name, limit in sorted(limits.items()):
+            used = monitor.spent(this_month, name)
+            st.progress(min(used / limit, 1.0), text=f"{name}: ₹{used:,.2f} of ₹{limit:,.2f} this month")
+        with st.form("budgets"):
+            new_limits = {name: st.number_input(f"{name} (₹ per month, 0 for none)", min_value=0.0,
+                                                value=float(limits.get(name, 0.0)), step=500.0, format="%.2f")
+                          for name in CATEGORIES["expense"]}
+            if st.form_submit_button("💾 Save Budgets"):
+                budgets.set_limits(new_limits, username)
+                st.rerun()
 
     st.markdown("---")
     st.header("📊 Summary Overview")
 
-    user_df = df[df["Username"] == username] if not df.empty else pd.DataFrame(columns=expected_cols)
-
-    if not user_df.empty:
+    if len(user_ledger):
         # -------------------- FILTER BY MONTH --------------------
-        months = user_df['Date'].apply(lambda x: datetime.strptime(x, "%d/%m/%Y").strftime("%B %Y")).unique()
-        selected_month = st.selectbox("Filter by Month", ["All"] + list(months))
+        selected_month = st.selectbox(
+            "Filter by Month", ["All"] + user_ledger.months(),
+            format_func=lambda m: m if m == "All" else datetime.strptime(m, "%Y-%m").strftime("%B %Y"))
 
+        all_months = user_ledger
         if selected_month != "All":
-            user_df = user_df[user_df['Date'].apply(lambda x: datetime.strptime(x, "%d/%m/%Y").strftime("%B %Y")) == selected_month]
+            if fingerprint is not None:
+                user_ledger = cache.view(fingerprint, username, selected_month)
+            else:
+                start, end = month_range(selected_month)
+                user_ledger = user_ledger.filter(start=start, end=end)
 
-        total_income = user_df[user_df["Type"] == "Income"]["Amount"].sum()
-        total_expense = user_df[user_df["Type"] == "Expense"]["Amount"].sum()
+        totals = user_ledger.sum_by("type")
+        total_income = totals.get("income", 0.0)
+        total_expense = totals.get("expense", 0.0)
         balance = total_income - total_expense
 
         col1, col2, col3 = st.columns(3)
@@ -78,44 +272,137 @@ if username:
 
         # ---------- Visualization ----------
         st.markdown("### 💹 Expense Breakdown")
-        expense_df = user_df[user_df["Type"] == "Expense"]
-        if not expense_df.empty:
-            fig, ax = plt.subplots()
-            expense_df.groupby("Category")["Amount"].sum().plot(
-                kind="pie", autopct="%1.1f%%", ax=ax, startangle=90
-            )
-            ax.set_ylabel("")
-            st.pyplot(fig)
+        expense_totals = user_ledger.filter(t_type="expense").sum_by("category")
+        if expense_totals:
+            with timed("render"):
+                fig, ax = plt.subplots()
+                pd.Series(expense_totals).sort_index().plot(
+                    kind="pie", autopct="%1.1f%%", ax=ax, startangle=90
+                )
+                ax.set_ylabel("")
+                st.pyplot(fig)
         else:
             st.info("No expenses yet to visualize.")
+
+        # ---------- Trends ----------
+        st.markdown("### 📈 Trends")
+        granularity = st.radio("Trend by", GRANULARITIES, index=GRANULARITIES.index("month"),
+                               format_func=str.capitalize, horizontal=True)
+
+        def rollup(level):
+            if fingerprint is None:  # just saved: the cached copy is behind
+                return all_months.rollup(level)
+            return cache.rollup(fingerprint, username, level)
+
+        trend = rollup(granularity)
+        if trend:
+            with timed("render"):
+                st.line_chart(pd.DataFrame({t.capitalize(): series(trend, t) for t in ("income", "expense")}))
+            st.markdown("#### 💹 Expense, Year over Year")
+            years = year_over_year(rollup("month"), "expense")
+            with timed("render"):
+                st.bar_chart(pd.DataFrame(years, index=pd.CategoricalIndex(MONTH_ABBRS, categories=MONTH_ABBRS,
+                                                                           ordered=True)), stack=False)
+        else:
+            st.info("No dated transactions yet to chart.")
     else:
         st.info("No transactions found. Add some to see the summary!")
 
     st.markdown("---")
     st.header("📜 Transaction History")
 
-    if not user_df.empty:
-        # Show dataframe with transaction indices
-        st.dataframe(user_df.sort_values(by="Date", ascending=False), use_container_width=True)
+    if len(user_ledger):
+        query = st.text_input("🔍 Search descriptions",
+                              placeholder='e.g. "vada pav last 6 months" or "chai category:Food"')
+        if query.strip():
+            if shard is None:
+                # First save of a new user: nothing was loaded yet.
+                shard, cache, fingerprint = store.shard(username), None, None
+            search = get_search(shard, shard.path)
+            if cache is not None:
+                cache.refresh(search, fingerprint)
+            else:
+                search.refresh()
+            start, end = month_range(selected_month) if selected_month != "All" else (None, None)
+            hits = search.search(query, username=username, start=start, end=end, limit=SEARCH_LIMIT)
+            page_df = pd.DataFrame(hits, columns=["id", "type", "category", "amount", "date", "description",
+                                                  "username"]).set_index("id")
+            page_df["date"] = pd.to_datetime(page_df["date"])
+        else:
+            # One page at a time from the Ledger's date index; only that page
+            # becomes a DataFrame. Cursors of the pages seen so far make "Newer" work.
+            scope = (username, selected_month)
+            if st.session_state.get("history_scope") != scope:
+                st.session_state.history_scope = scope
+                st.session_state.history_cursors = [None]
+            cursors = st.session_state.history_cursors
+            page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+            page, next_cursor = user_ledger.page(cursors[-1], page_size)
+            if not len(page) and len(cursors) > 1:
+                # Deletes emptied this page: go back to the newest one.
+                del cursors[1:]
+                page, next_cursor = user_ledger.page(None, page_size)
+            page_df = page.to_pandas()
+
+        history = page_df.copy()
+        history["type"] = history["type"].astype(str).str.capitalize()
+        history["date"] = history["date"].dt.strftime("%d/%m/%Y")
+        history.columns = expected_cols[:-1]
+        with timed("render"):
+            st.dataframe(history, use_container_width=True)
+
+        if query.strip():
+            more = f" (the first {SEARCH_LIMIT})" if len(page_df) == SEARCH_LIMIT else ""
+            st.caption(f"{len(page_df)} matches, newest first{more}")
+        else:
+            col_newer, col_page, col_older = st.columns([1, 2, 1])
+            if col_newer.button("◀ Newer", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+            col_page.caption(f"Page {len(cursors)} · {len(user_ledger):,} transactions")
+            if col_older.button("Older ▶", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
 
         # Delete individual transaction
         st.markdown("### 🗑 Delete a Transaction")
-        transaction_indices = user_df.index.tolist()
-        selected_index = st.selectbox("Select transaction to delete:", transaction_indices)
-        if st.button("Delete Selected Transaction"):
-            df = df.drop(selected_index).reset_index(drop=True)
-            df.to_csv(DATA_FILE, index=False)
-            st.success("Transaction deleted successfully!")
-            st.experimental_rerun()
+        # Picks from the rows shown above: this page, or the search hits.
+        if len(page_df):
+            labels = (page_df["date"].dt.strftime("%d/%m/%Y").fillna("?") + " · "
+                      + page_df["category"].astype(str) + " · ₹" + page_df["amount"].map("{:,.2f}".format)
+                      + " · " + page_df["description"].astype(str))
+            selected_id = st.selectbox("Select transaction to delete:", page_df.index.tolist(),
+                                       format_func=labels.to_dict().get)
+            if st.button("Delete Selected Transaction"):
+                store.shard(username).delete([selected_id])
+                st.success("Transaction deleted successfully!")
+                st.rerun()
+        else:
+            st.caption("No transactions match that search.")
 
         # Option to clear all transactions
         if st.button("🗑 Clear All My Transactions"):
-            df = df[df["Username"] != username]
-            df.to_csv(DATA_FILE, index=False)
+            store.clear(username)
             st.warning("All your transactions deleted!")
-            st.experimental_rerun()
+            st.rerun()
     else:
         st.write("No records yet. Start by adding your first transaction!")
 
 else:
     st.info("👆 Please enter your name to start tracking your expenses.")
+
+# -------------------- PROFILING --------------------
+page_run.stop()
+if is_enabled():
+    with st.sidebar:
+        st.header("⏱ Profiling")
+        for name, label in (("page", "Last page run"), ("save", "Last save")):
+            breakdown = last_breakdown(name)
+            if breakdown is None:
+                continue
+            st.markdown(f"**{label}** · {breakdown.ledger or '—'} · {breakdown.total * 1000:,.1f} ms")
+            rows = [(phase, round(seconds * 1000, 2)) for phase, seconds in breakdown.items()]
+            st.dataframe(pd.DataFrame(rows, columns=["Phase", "ms"]).set_index("Phase"), use_container_width=True)
+        st.download_button("⬇️ Histograms (JSON)", json.dumps(snapshot(), indent=1), "hisaab_metrics.json",
+                           "application/json")
+        st.download_button("⬇️ Histograms (Prometheus)", to_prometheus(), "hisaab_metrics.prom", "text/plain")
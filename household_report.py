@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from ledger_partitions import holds_partitions
+from ledger_store import SQLITE_EXTENSIONS, open_store
+
+DATA_DIR = "data"
+# data/<user>_transactions.csv, as LoginScreen creates them, or the .db /
+# .parquet file that HK_BACKEND puts next to it.
+LEDGER_RE = re.compile(r"^(.+)_transactions\.(csv|parquet|" + "|".join(e[1:] for e in SQLITE_EXTENSIONS) + r")$")
+
+
+# ---------- DISCOVERY ----------
+def find_ledgers(data_dir=DATA_DIR):
+    """member -> ledger path, for every per-user ledger under `data_dir`.
+
+    A member's CSV path is preferred when there is one, since open_store
+    follows it to the month partitions or the HK_BACKEND file. A partition
+    directory whose flat file was archived counts too.
+    """
+    found = {}
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        match = LEDGER_RE.match(name)
+        if match and os.path.isfile(path):
+            member, extension = match.groups()
+            if member not in found or extension == "csv":
+                found[member] = path
+        elif holds_partitions(path):
+            found.setdefault(name, path)
+    return dict(sorted(found.items()))
+
+
+# ---------- AGGREGATION ----------
+def member_sums(path):
+    """{(month, type, category): amount} for one ledger; runs in a worker process.
+
+    Comes from the ledger's month rollup, so a CSV ledger with a current
+    totals sidecar is not parsed at all. Undated rows are left out, as in
+    rollups. The store is read-only: a member's ledger is never upgraded
+    and no lock or totals sidecar is written next to it.
+    """
+    sums = {}
+    for month, types in open_store(path, read_only=True).rollup("month").items():
+        for t_type, categories in types.items():
+            for category, amount in categories.items():
+                sums[(month, t_type, category)] = amount
+    return sums
+
+
+def _safe_sums(path):
+    # One unreadable ledger is reported rather than sinking the whole report.
+    try:
+        return member_sums(path), None
+    except (OSError, ValueError, KeyError) as exc:
+        return {}, str(exc)
+
+
+def _summary(sums):
+    # sums: {(month, type, category): amount}
+    totals, categories, months = {}, {}, {}
+    for (month, t_type, category), amount in sums.items():
+        totals[t_type] = totals.get(t_type, 0.0) + amount
+        months.setdefault(month, {})
+        months[month][t_type] = months[month].get(t_type, 0.0) + amount
+        if t_type == "expense":
+            categories[category] = categories.get(category, 0.0) + amount
+    income, expense = totals.get("income", 0.0), totals.get("expense", 0.0)
+    return {"income": income, "expense": expense, "balance": income - expense,
+            "expense_by_category": dict(sorted(categories.items())), "months": dict(sorted(months.items()))}
+
+
+def household_report(data_dir=DATA_DIR, workers=None, month=None):
+    """Combined and per-member totals over every ledger in `data_dir`.
+
+    Each ledger is aggregated in its own worker process and the partial
+    per-(member, month, type, category) sums are merged here, so dozens of
+    large ledgers are read side by side instead of one after another.
+    `month` ("YYYY-MM") limits the report to that month.
+    """
+    ledgers = find_ledgers(data_dir)
+    members = list(ledgers)
+    paths = [ledgers[m] for m in members]
+    if len(paths) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(paths))) as pool:
+            results = list(pool.map(_safe_sums, paths))
+    else:
+        results = [_safe_sums(path) for path in paths]
+
+    merged, errors = {}, {}
+    for member, (sums, error) in zip(members, results):
+        if error is not None:
+            errors[member] = error
+        for (row_month, t_type, category), amount in sums.items():
+            if month is None or row_month == month:
+                merged[(member, row_month, t_type, category)] = amount
+
+    household = {key[1:]: 0.0 for key in merged}
+    by_member = {member: {} for member in members if member not in errors}
+    for (member, *key), amount in merged.items():
+        household[tuple(key)] += amount
+        by_member[member][tuple(key)] = amount
+    return {"month": month, "household": _summary(household),
+            "members": {member: _summary(sums) for member, sums in by_member.items()},
+            "errors": errors}
+
+
+def format_report(report):
+    title = f"🏠 Household Report — {report['month'] or 'All Time'}"
+    lines = [title, "=" * len(title)]
+
+    def totals(summary):
+        return (f"💰 Income: ₹{summary['income']:,.2f} | 💸 Expense: ₹{summary['expense']:,.2f} | "
+                f"💵 Balance: ₹{summary['balance']:,.2f}")
+
+    lines.append(totals(report["household"]))
+    for category, amount in report["household"]["expense_by_category"].items():
+        lines.append(f"   {category:<15}₹{amount:,.2f}")
+    for member, summary in report["members"].items():
+        lines += ["", f"👤 {member.capitalize()}", totals(summary)]
+        for category, amount in summary["expense_by_category"].items():
+            lines.append(f"   {category:<15}₹{amount:,.2f}")
+    for member, error in report["errors"].items():
+        lines += ["", f"⚠️ Skipped {member}: {error}"]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Totals across every member's ledger in the data folder.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--month", help="YYYY-MM (default: all time)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        report = household_report(args.data_dir, args.workers, args.month)
+    except OSError as exc:
+        parser.exit(1, f"⚠️ Report failed: {exc}\n")
+    print(json.dumps(report) if args.json else format_report(report))
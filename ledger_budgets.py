@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+
+from ledger_lock import locked
+from ledger_schema import ISO_DATE
+from ledger_totals import file_fingerprint, month_key
+
+# ---------- CATEGORIES ----------
+# The categories every app offers when adding a transaction. Rows written
+# by scripts or older versions may use others; totals keep those as they are.
+CATEGORIES = {
+    "income": ["Salary", "Investments", "Other"],
+    "expense": ["Food", "Rent", "Bills", "Travel", "Shopping", "Health", "Entertainment", "Misc"],
+}
+# Fractions of a monthly budget that raise an alert when spending crosses them.
+THRESHOLDS = (0.8, 1.0)
+
+
+class Alert:
+    """Spending in `category` for `month` crossed `threshold` of its budget."""
+
+    __slots__ = ("category", "month", "spent", "limit", "threshold")
+
+    def __init__(self, category, month, spent, limit, threshold):
+        self.category = category
+        self.month = month
+        self.spent = spent
+        self.limit = limit
+        self.threshold = threshold
+
+    @property
+    def over(self):
+        return self.threshold >= 1.0
+
+    def __str__(self):
+        share = f"{self.spent / self.limit:.0%}"
+        if self.over:
+            return (f"🚨 {self.category} budget exceeded for {self.month}: "
+                    f"₹{self.spent:,.2f} of ₹{self.limit:,.2f} ({share})")
+        return f"⚠️ {self.category} is at {share} of its {self.month} budget: ₹{self.spent:,.2f} of ₹{self.limit:,.2f}"
+
+    def to_dict(self):
+        return {"category": self.category, "month": self.month, "spent": self.spent, "limit": self.limit,
+                "threshold": self.threshold, "message": str(self)}
+
+
+# ---------- BUDGETS ----------
+class Budgets:
+    """Monthly expense limits per user and category, in a `.budgets.json` sidecar next to a ledger.
+
+    Single-user ledgers keep theirs under "", as RunningTotals does. The
+    file is re-read only when another process changed it, and rewritten
+    whole under its own advisory lock (see ledger_lock), so two windows
+    setting budgets at once do not lose each other's changes.
+    """
+
+    def __init__(self, ledger_path, thresholds=THRESHOLDS):
+        self.path = ledger_path + ".budgets.json"
+        self.thresholds = tuple(sorted(thresholds))
+        self._limits = ({}, None)
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            stamp = tuple(file_fingerprint(self.path))
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            limits, seen = self._limits
+            if stamp != seen:
+                try:
+                    with open(self.path) as f:
+                        limits = json.load(f)["limits"]
+                except (OSError, ValueError, KeyError):
+                    limits = {}
+                self._limits = (limits, stamp)
+            return limits
+
+    def limits(self, username=""):
+        """category -> monthly limit for `username`."""
+        return dict(self._read().get(username or "", {}))
+
+    def limit(self, category, username=""):
+        return self._read().get(username or "", {}).get(category)
+
+    def set_limits(self, limits, username=""):
+        """Set (or, for None or 0, remove) the monthly limit of each category in `limits`."""
+        # Budgets may be set before the first transaction created the ledger's folder.
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with locked(self.path):
+            every = {user: dict(own) for user, own in self._read().items()}
+            own = every.setdefault(username or "", {})
+            for category, amount in limits.items():
+                if amount:
+                    own[category] = float(amount)
+                else:
+                    own.pop(category, None)
+            if not own:
+                del every[username or ""]
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"limits": every}, f, indent=1)
+            os.replace(tmp_path, self.path)
+            with self._lock:
+                self._limits = (every, tuple(file_fingerprint(self.path)))
+
+    def check(self, category, month, before, after, username=""):
+        """The Alert for the highest threshold that spending crossed going from `before` to `after`; else None."""
+        limit = self.limit(category, username)
+        if not limit:
+            return None
+        for threshold in reversed(self.thresholds):
+            if before < threshold * limit <= after:
+                return Alert(category, month, after, limit, threshold)
+        return None
+
+
+# ---------- MONITOR ----------
+class BudgetMonitor:
+    """Checks each expense against its budget as it is added, without aggregating the ledger.
+
+    `totals` is anything with `period_total` (a store, or a LedgerWatcher)
+    and is asked once per month and category, which is a lookup in running
+    totals for CSV ledgers. From then on the monitor keeps the sum itself,
+    adding each row passed to `add`, so the check costs the same on a
+    ledger of any size and sees rows a write-behind queue has not written
+    yet. Call `reset` when `totals` has caught up with everything added,
+    to pick up what other writers appended.
+    """
+
+    def __init__(self, budgets, totals, username="", date_format=ISO_DATE):
+        self.budgets = budgets
+        self.totals = totals
+        self.username = username
+        self.date_format = date_format
+        self._spent = {}  # (month, category) -> amount
+
+    def spent(self, month, category):
+        key = (month, category)
+        if key not in self._spent:
+            self._spent[key] = self.totals.period_total(month, "expense", category, self.username or None)
+        return self._spent[key]
+
+    def add(self, row):
+        """Count `row` (as passed to LedgerStore.append) before it is saved; its Alert, if any."""
+        if str(row.get("type", "")).lower() != "expense":
+            return None
+        month = month_key(row.get("date", ""), self.date_format)
+        if not month:
+            return None
+        category = row.get("category", "")
+        before = self.spent(month, category)
+        after = self._spent[(month, category)] = before + float(row.get("amount", 0))
+        return self.budgets.check(category, month, before, after, self.username)
+
+    def reset(self):
+        self._spent.clear()
@@ -0,0 +1,92 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# fcntl is POSIX-only; elsewhere the locks below are no-ops and writers are
+# only safe within one process.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+RETRIES = 8
+
+_held = threading.local()
+
+
+class ConflictError(RuntimeError):
+    """A rewrite kept losing the race against other writers."""
+
+
+# ---------- ADVISORY LOCKS ----------
+@contextmanager
+def locked(path, shared=False, create=True):
+    """Hold the advisory lock for the ledger at `path`.
+
+    The lock lives on `<path>.lock` rather than the ledger itself, because
+    rewrites replace the ledger file and a lock on the old inode would no
+    longer exclude anyone. Re-entrant per thread: nested calls for a path
+    this thread already holds just run. Without `create`, a missing lock
+    file is not made and the caller runs unlocked: no writer has taken it.
+    """
+    held = getattr(_held, "paths", None)
+    if held is None:
+        held = _held.paths = {}
+    if path in held or (not create and not os.path.exists(path + ".lock")):
+        yield
+        return
+
+    try:
+        lock_file = open(path + ".lock", "a")
+    except OSError:
+        if not shared:
+            raise
+        # Read-only data dir: nobody can be writing through us, read unlocked.
+        yield
+        return
+    held[path] = lock_file
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        del held[path]
+        # Closing the file releases the lock.
+        lock_file.close()
+
+
+# ---------- VERSION COUNTER ----------
+def read_version(path):
+    try:
+        with open(path + ".version") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_version(path):
+    """Record a write to the ledger; call with its lock held."""
+    version = read_version(path) + 1
+    tmp_path = f"{path}.version.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, path + ".version")
+    return version
+
+
+def optimistic_rewrite(path, compute, commit, retries=RETRIES):
+    """Run `compute()` without the lock, then `commit(result)` under it.
+
+    If another writer bumped the version in between, the result is stale:
+    recompute and try again, up to `retries` times.
+    """
+    for _ in range(retries):
+        version = read_version(path)
+        result = compute()
+        with locked(path):
+            if read_version(path) != version:
+                continue
+            commit(result)
+            bump_version(path)
+            return result
+    raise ConflictError(f"{path} kept changing; gave up after {retries} attempts")
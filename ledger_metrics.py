@@ -0,0 +1,273 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+# ---------- SETTINGS ----------
+# Off unless HK_PROFILE is set (or an app is started with --profile).
+# HK_PROFILE=1 turns it on; a path ending in .json or .prom also writes
+# the histograms there when the process exits.
+ENV_VAR = "HK_PROFILE"
+PHASES = ("load", "parse", "filter", "aggregate", "render", "write")
+# Histogram bucket bounds in seconds, as Prometheus expects them.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+enabled = False
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}  # (phase, operation, ledger) -> Histogram
+_last = {}  # operation -> Breakdown, most recent last
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def cumulative(self):
+        running, out = 0, []
+        for count in self.counts:
+            running += count
+            out.append(running)
+        return out
+
+
+class Breakdown:
+    """Where one run of an operation spent its time, phase by phase."""
+
+    __slots__ = ("operation", "ledger", "total", "phases", "finished")
+
+    def __init__(self, operation, ledger, total, phases):
+        self.operation = operation
+        self.ledger = ledger
+        self.total = total
+        self.phases = phases
+        self.finished = time.time()
+
+    def items(self):
+        """(phase, seconds) in PHASES order, then "other" for whatever no phase covered."""
+        order = sorted(self.phases.items(),
+                       key=lambda item: PHASES.index(item[0]) if item[0] in PHASES else len(PHASES))
+        # Imports, Tk callbacks, waiting on locks.
+        other = self.total - sum(self.phases.values())
+        if other >= 0.0001:
+            order.append(("other", other))
+        return order
+
+    def __str__(self):
+        parts = " · ".join(f"{phase} {seconds * 1000:.1f}" for phase, seconds in self.items())
+        return f"⏱ {self.operation} {self.total * 1000:.1f} ms" + (f" ({parts})" if parts else "")
+
+    def to_dict(self):
+        return {"operation": self.operation, "ledger": self.ledger, "total_s": self.total,
+                "phases_s": dict(self.phases), "finished": self.finished}
+
+
+def enable(export_path=None):
+    """Start timing; `export_path` (.json or .prom) gets the histograms at exit."""
+    global enabled
+    enabled = True
+    if export_path:
+        atexit.register(export, export_path)
+
+
+def is_enabled():
+    return enabled
+
+
+def enable_from_env():
+    value = os.environ.get(ENV_VAR, "").strip()
+    if value and value.lower() not in ("0", "false", "no", "off"):
+        enable(value if value.endswith((".json", ".prom")) else None)
+
+
+def enable_from_argv(argv=None):
+    # The Tk and Streamlit apps take a bare --profile; the CLI has its own flag.
+    if "--profile" in (sys.argv[1:] if argv is None else argv):
+        enable()
+
+
+# ---------- TIMERS ----------
+class _Null:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _Null()
+
+
+class _Timer:
+    __slots__ = ("phase", "start", "children")
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault("timers", [])
+        stack.append(self)
+        self.children = 0.0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = _local.timers
+        stack.pop()
+        if stack:
+            stack[-1].children += elapsed
+        # Time in nested phases is theirs: a load inside an aggregate is
+        # counted once, as load.
+        _observe(self.phase, elapsed - self.children)
+        return False
+
+
+def timed(phase):
+    """Context manager timing one phase; a shared no-op while profiling is off."""
+    return _Timer(phase) if enabled else _NULL
+
+
+def phase(name):
+    """Decorator timing every call of a function as phase `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class operation:
+    """One user-visible action (a save, a summary, a page run) and the phases timed inside it.
+
+    Operations on the same thread nest; phases go to the innermost one.
+    `ledger` says whose ledger it ran on, so a slow phase can be traced to
+    one user's file. Runs that timed no phase at all (a watcher poll that
+    found nothing new, say) are not recorded.
+    """
+
+    def __init__(self, name, ledger=""):
+        self.name = name
+        self.ledger = ledger
+        self.phases = {}
+
+    def __enter__(self):
+        if enabled:
+            self._outer = getattr(_local, "op", None)
+            self._timers = _local.__dict__.get("timers", [])
+            _local.op, _local.timers = self, []
+            self._started = time.perf_counter()
+        return self
+
+    def start(self):
+        """Begin as the thread's outermost operation, for a script that cannot use a with block.
+
+        Whatever an interrupted earlier run left open on the thread is dropped.
+        """
+        if enabled:
+            self._outer, self._timers = None, []
+            _local.op, _local.timers = self, []
+            self._started = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.__exit__(None, None, None)
+
+    def __exit__(self, *exc):
+        if not enabled or getattr(_local, "op", None) is not self:
+            return False
+        total = time.perf_counter() - self._started
+        _local.op, _local.timers = self._outer, self._timers
+        if self.phases:
+            _observe("total", total, self)
+            with _lock:
+                _last.pop(self.name, None)
+                _last[self.name] = Breakdown(self.name, self.ledger, total, self.phases)
+        return False
+
+
+def _observe(phase, seconds, op=None):
+    if op is None:
+        op = getattr(_local, "op", None)
+        if op is not None:
+            op.phases[phase] = op.phases.get(phase, 0.0) + seconds
+    key = (phase, op.name, op.ledger) if op is not None else (phase, "", "")
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+# ---------- REPORTING ----------
+def last_breakdown(name=None):
+    """The latest Breakdown of operation `name`, or of any operation; None if nothing ran."""
+    with _lock:
+        if name is not None:
+            return _last.get(name)
+        return next(reversed(_last.values()), None)
+
+
+def snapshot():
+    """Every histogram and the latest breakdown per operation, as plain data."""
+    with _lock:
+        histograms = [{"phase": phase, "operation": op, "ledger": ledger, "count": h.count, "sum_s": h.total,
+                       "max_s": h.max, "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.cumulative()))}
+                      for (phase, op, ledger), h in sorted(_histograms.items())]
+        return {"histograms": histograms, "last": [b.to_dict() for b in _last.values()]}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus():
+    """The histograms in the Prometheus text exposition format."""
+    lines = ["# HELP hk_phase_seconds Time spent in each phase of an operation.",
+             "# TYPE hk_phase_seconds histogram"]
+    with _lock:
+        items = sorted(_histograms.items())
+        for (phase, op, ledger), h in items:
+            labels = f'phase="{_label(phase)}",operation="{_label(op)}",ledger="{_label(ledger)}"'
+            for bound, count in zip([str(b) for b in BUCKETS] + ["+Inf"], h.cumulative()):
+                lines.append(f'hk_phase_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"hk_phase_seconds_sum{{{labels}}} {h.total!r}")
+            lines.append(f"hk_phase_seconds_count{{{labels}}} {h.count}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path):
+    """Write the histograms to `path`: Prometheus text for .prom, JSON otherwise."""
+    text = to_prometheus() if path.endswith(".prom") else json.dumps(snapshot(), indent=1)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _last.clear()
+
+
+enable_from_env()
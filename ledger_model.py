@@ -0,0 +1,359 @@
+import math
+from array import array
+from bisect import bisect_left
+from datetime import date as date_cls, datetime
+
+from ledger_metrics import phase
+from ledger_store import ISO_DATE
+from ledger_totals import GRANULARITIES, periods
+
+PAISE = 100
+EPOCH_ORDINAL = date_cls(1970, 1, 1).toordinal()
+# Day ordinals start at 1, so 0 is free to mean "no readable date".
+NO_DATE = 0
+
+
+def to_ordinal(value):
+    """Date, datetime, Timestamp or ISO string -> day ordinal; NO_DATE if unreadable."""
+    if isinstance(value, str):
+        try:
+            value = datetime.strptime(value.strip(), ISO_DATE)
+        except ValueError:
+            return NO_DATE
+    try:
+        return value.toordinal()
+    except (AttributeError, ValueError):
+        return NO_DATE  # None, NaN, NaT
+
+
+def month_range(label):
+    """"YYYY-MM" -> (first day, first day of the next month), for `filter`."""
+    start = datetime.strptime(label, "%Y-%m").date()
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def _text(value):
+    # NaN and None from a frame become "".
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value)
+
+
+class Interner:
+    """Each distinct string stored once; rows hold its small integer code."""
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class Transaction:
+    """One ledger row, as handed out by iterating a Ledger."""
+
+    __slots__ = ("id", "type", "category", "amount", "date", "description", "username")
+
+    def __init__(self, id, type, category, amount, date, description, username):
+        self.id = id
+        self.type = type
+        self.category = category
+        self.amount = amount
+        self.date = date
+        self.description = description
+        self.username = username
+
+    def __repr__(self):
+        return (f"Transaction({self.id!r}, {self.type!r}, {self.category!r}, {self.amount!r}, "
+                f"{self.date!r}, {self.description!r}, {self.username!r})")
+
+
+# ---------- COMPACT LEDGER ----------
+class Ledger:
+    """Column store for ledger rows without per-row Python objects.
+
+    Type, category and username are codes into shared `Interner` tables,
+    amounts are integer paise in an `array('q')`, and dates are int32 day
+    ordinals. A million rows take about 20 MB plus the description and id
+    strings, where the equivalent object-dtype DataFrame takes several
+    times that.
+
+    `filter` returns a new Ledger sharing the string tables, and `page`
+    walks it newest first through a date index built once. The bulk
+    operations run on NumPy views of the arrays (`to_numpy`, no copy);
+    `to_pandas` builds a frame with categorical columns when one is needed.
+    NumPy views pin an array's buffer, so drop them before appending.
+    """
+
+    __slots__ = ("types", "categories", "users", "type_codes", "category_codes", "user_codes",
+                 "paise", "days", "descriptions", "ids", "_order")
+
+    def __init__(self, types=None, categories=None, users=None):
+        self.types = types or Interner()
+        self.categories = categories or Interner()
+        self.users = users or Interner()
+        self.type_codes = array("b")
+        self.category_codes = array("h")
+        self.user_codes = array("i")
+        self.paise = array("q")
+        self.days = array("i")
+        self.descriptions = []
+        self.ids = []
+        self._order = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        day = self.days[i]
+        return Transaction(self.ids[i], self.types.values[self.type_codes[i]],
+                           self.categories.values[self.category_codes[i]], self.paise[i] / PAISE,
+                           date_cls.fromordinal(day) if day != NO_DATE else None,
+                           self.descriptions[i], self.users.values[self.user_codes[i]])
+
+    # ----- building -----
+    def append(self, row):
+        """Add one row dict (the keys `LedgerStore.append` takes, plus `id`)."""
+        amount = row.get("amount")
+        try:
+            paise = round(float(amount) * PAISE)
+        except (TypeError, ValueError, OverflowError):
+            paise = 0
+        self.type_codes.append(self.types.code(_text(row.get("type")).lower()))
+        self.category_codes.append(self.categories.code(_text(row.get("category"))))
+        self.user_codes.append(self.users.code(_text(row.get("username"))))
+        self.paise.append(paise)
+        self.days.append(to_ordinal(row.get("date")))
+        self.descriptions.append(_text(row.get("description")))
+        self.ids.append(_text(row.get("id")))
+        self._order = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        ledger = cls()
+        for row in rows:
+            ledger.append(row)
+        return ledger
+
+    @classmethod
+    @phase("parse")
+    def from_frame(cls, df):
+        """Canonical frame from `LedgerStore.read` (indexed by id) -> Ledger."""
+        import numpy as np
+        import pandas as pd
+
+        ledger = cls()
+        for table, codes, column in ((ledger.types, ledger.type_codes, "type"),
+                                     (ledger.categories, ledger.category_codes, "category"),
+                                     (ledger.users, ledger.user_codes, "username")):
+            cat = pd.Categorical(df[column].fillna("").astype(str))
+            for value in cat.categories:
+                table.code(value)
+            codes.frombytes(cat.codes.astype(f"i{codes.itemsize}").tobytes())
+        amounts = pd.to_numeric(df["amount"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        ledger.paise.frombytes(np.round(amounts * PAISE).astype(np.int64).tobytes())
+        dates = pd.to_datetime(df["date"], errors="coerce")
+        days = dates.to_numpy(dtype="datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+        days[dates.isna().to_numpy()] = NO_DATE
+        ledger.days.frombytes(days.astype(np.int32).tobytes())
+        ledger.descriptions = df["description"].fillna("").astype(str).tolist()
+        ledger.ids = [str(i) for i in df.index]
+        return ledger
+
+    # ----- views -----
+    def to_numpy(self):
+        """Zero-copy NumPy views of the coded columns."""
+        import numpy as np
+
+        columns = {"type": self.type_codes, "category": self.category_codes, "username": self.user_codes,
+                   "paise": self.paise, "day": self.days}
+        return {name: np.frombuffer(values, dtype=f"i{values.itemsize}") for name, values in columns.items()}
+
+    def to_pandas(self):
+        """Canonical ledger frame (see ledger_store.FIELDS), indexed by id."""
+        import numpy as np
+        import pandas as pd
+
+        cols = self.to_numpy()
+        dates = (cols["day"].astype(np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+        dates[cols["day"] == NO_DATE] = np.datetime64("NaT")
+        return pd.DataFrame({
+            "type": pd.Categorical.from_codes(cols["type"], categories=self.types.values),
+            "category": pd.Categorical.from_codes(cols["category"], categories=self.categories.values),
+            "amount": cols["paise"] / PAISE,
+            "date": pd.to_datetime(dates),
+            "description": self.descriptions,
+            "username": pd.Categorical.from_codes(cols["username"], categories=self.users.values),
+        }, index=pd.Index(self.ids, dtype=object))
+
+    # ----- queries -----
+    def _mask(self, username=None, start=None, end=None, month=None, t_type=None):
+        import numpy as np
+
+        cols = self.to_numpy()
+        mask = np.ones(len(self), dtype=bool)
+        for column, table, value in (("username", self.users, username), ("type", self.types, t_type)):
+            if value is not None:
+                code = table.codes.get(value.lower() if column == "type" else value)
+                mask &= cols[column] == (code if code is not None else -1)
+        day = cols["day"]
+        if start is not None:
+            mask &= day >= to_ordinal(start)
+        if end is not None:
+            mask &= (day < to_ordinal(end)) & (day != NO_DATE)
+        if month is not None:
+            mask &= (self._months(day) % 12 + 1 == month) & (day != NO_DATE)
+        return mask
+
+    @staticmethod
+    def _months(day):
+        # Months since 1970-01 for each day ordinal.
+        import numpy as np
+
+        days = (day.astype(np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+        return days.astype("datetime64[M]").astype(np.int64)
+
+    @phase("filter")
+    def filter(self, username=None, start=None, end=None, month=None, t_type=None):
+        """Rows matching every given condition, as a Ledger sharing this one's string tables.
+
+        `start` is inclusive and `end` exclusive, as in LedgerStore.
+        """
+        import numpy as np
+
+        return self._take(np.flatnonzero(self._mask(username, start, end, month, t_type)))
+
+    def _take(self, rows):
+        subset = Ledger(self.types, self.categories, self.users)
+        cols = self.to_numpy()
+        for name, target in (("type", subset.type_codes), ("category", subset.category_codes),
+                             ("username", subset.user_codes), ("paise", subset.paise), ("day", subset.days)):
+            target.frombytes(cols[name][rows].tobytes())
+        subset.descriptions = [self.descriptions[i] for i in rows]
+        subset.ids = [self.ids[i] for i in rows]
+        return subset
+
+    # ----- history -----
+    def date_index(self):
+        """Row positions sorted by (day, id), oldest first, undated rows first.
+
+        Built on first use and kept until the next append; callers that keep
+        a Ledger across requests can build it up front.
+        """
+        if self._order is None:
+            import numpy as np
+
+            ids = np.array(self.ids, dtype=object)
+            id_rank = np.empty(len(ids), dtype=np.int64)
+            id_rank[ids.argsort(kind="stable")] = np.arange(len(ids))
+            self._order = np.lexsort((id_rank, self.to_numpy()["day"]))
+        return self._order
+
+    @phase("filter")
+    def page(self, cursor=None, size=50):
+        """One page of rows, newest date first, and the cursor for the next (None after the last).
+
+        A cursor is the (day ordinal, id) of the last row handed out, so a
+        page starts in the same place even after rows were added or deleted.
+        Finding it is a binary search in the date index; only the page's rows
+        are copied.
+        """
+        order = self.date_index()
+        end = len(order)
+        if cursor is not None:
+            import numpy as np
+
+            day, row_id = cursor
+            days = self.to_numpy()["day"][order]
+            lo, hi = np.searchsorted(days, day, "left"), np.searchsorted(days, day, "right")
+            end = int(lo) + bisect_left([self.ids[i] for i in order[lo:hi]], row_id)
+        start = max(0, end - size)
+        rows = order[start:end][::-1]
+        next_cursor = (int(self.days[rows[-1]]), self.ids[rows[-1]]) if start > 0 else None
+        return self._take(rows), next_cursor
+
+    @phase("aggregate")
+    def sum_by(self, key):
+        """Amount per type, category or username: {label: rupees}, labels with rows only."""
+        import numpy as np
+
+        tables = {"type": self.types, "category": self.categories, "username": self.users}
+        codes = self.to_numpy()[key]
+        table = tables[key]
+        counts = np.bincount(codes, minlength=len(table.values))
+        sums = np.bincount(codes, weights=self.to_numpy()["paise"], minlength=len(table.values))
+        return {table.values[c]: float(sums[c]) / PAISE for c in np.flatnonzero(counts)}
+
+    @phase("aggregate")
+    def month_rollup(self):
+        """{"YYYY-MM": {type: rupees}} for every month with dated rows, in order."""
+        import numpy as np
+
+        cols = self.to_numpy()
+        dated = cols["day"] != NO_DATE
+        months = self._months(cols["day"][dated])
+        types = cols["type"][dated].astype(np.int64)
+        keys, inverse = np.unique(months * 128 + types, return_inverse=True)
+        sums = np.bincount(inverse, weights=cols["paise"][dated], minlength=len(keys))
+        rollup = {}
+        for key, total in zip(keys.tolist(), sums.tolist()):
+            month, t_type = divmod(key, 128)
+            label = f"{1970 + month // 12}-{month % 12 + 1:02d}"
+            rollup.setdefault(label, {})[self.types.values[t_type]] = total / PAISE
+        return rollup
+
+    @phase("aggregate")
+    def rollup(self, granularity="month", username=None):
+        """Same shape as LedgerStore.rollup: {period: {type: {category: rupees}}}, oldest first."""
+        import numpy as np
+
+        if username is not None:
+            return self.filter(username=username).rollup(granularity)
+        cols = self.to_numpy()
+        dated = cols["day"] != NO_DATE
+        # One sum per distinct (day, type, category); only those are labelled in Python.
+        keys = (cols["day"][dated].astype(np.int64) * 128 + cols["type"][dated]) * 32768 + cols["category"][dated]
+        keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=cols["paise"][dated], minlength=len(keys))
+        level = GRANULARITIES.index(granularity)
+        result = {}
+        for key, total in zip(keys.tolist(), sums.tolist()):
+            rest, category = divmod(key, 32768)
+            day, t_type = divmod(rest, 128)
+            cell = result.setdefault(periods(date_cls.fromordinal(day))[level], {}).setdefault(
+                self.types.values[t_type], {})
+            name = self.categories.values[category]
+            cell[name] = cell.get(name, 0.0) + total / PAISE
+        return dict(sorted(result.items()))
+
+    def months(self):
+        """Calendar months with rows, oldest first, as "YYYY-MM"."""
+        return list(self.month_rollup())
+
+    # Same signatures as LedgerStore, so a Ledger can answer summary queries.
+    def totals(self, username=None, start=None, end=None, month=None):
+        return self.filter(username, start, end, month).sum_by("type")
+
+    def category_totals(self, t_type, username=None, start=None, end=None, month=None):
+        return self.filter(username, start, end, month, t_type).sum_by("category")
+
+    def period_total(self, period, t_type, category, username=None, granularity="month"):
+        if granularity != "month":
+            return self.rollup(granularity, username).get(period, {}).get(t_type.lower(), {}).get(category, 0.0)
+        # Only the month's rows are summed, not rolled up.
+        start, end = month_range(period)
+        return self.category_totals(t_type, username, start, end).get(category, 0.0)
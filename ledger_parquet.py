@@ -0,0 +1,199 @@
+import argparse
+import os
+
+import pandas as pd
+
+from ledger_lock import bump_version, locked
+from ledger_store import FIELDS, ISO_DATE, LedgerStore, empty_frame, format_date, new_id, open_store, with_id
+from ledger_totals import file_fingerprint
+
+# pyarrow is optional: only Parquet ledgers need it.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Amounts are stored as integer paise so sums are exact and half the width
+# of a float64 column once dictionary-encoded strings are counted in.
+PAISE = 100
+
+
+def parquet_schema():
+    return pa.schema([
+        ("type", pa.dictionary(pa.int8(), pa.string())),
+        ("category", pa.dictionary(pa.int16(), pa.string())),
+        ("amount_paise", pa.int64()),
+        ("date", pa.date32()),
+        ("description", pa.string()),
+        ("username", pa.dictionary(pa.int32(), pa.string())),
+        ("id", pa.string()),
+    ])
+
+
+def to_table(df):
+    """Canonical ledger frame (indexed by id) -> typed Arrow table."""
+    return pa.table({
+        "type": pa.array(df["type"].astype(str).str.lower(), pa.string()).dictionary_encode(),
+        "category": pa.array(df["category"].astype(str), pa.string()).dictionary_encode(),
+        "amount_paise": pa.array((df["amount"].fillna(0) * PAISE).round().astype("int64")),
+        "date": pa.array(df["date"], pa.timestamp("ns")).cast(pa.date32()),
+        "description": pa.array(df["description"].fillna("").astype(str), pa.string()),
+        "username": pa.array(df["username"].fillna("").astype(str), pa.string()).dictionary_encode(),
+        "id": pa.array(df.index.astype(str), pa.string()),
+    }).cast(parquet_schema())
+
+
+def from_table(table):
+    df = table.to_pandas()
+    if "amount_paise" in df:
+        df["amount"] = df.pop("amount_paise") / PAISE
+    if "date" in df:
+        df["date"] = pd.to_datetime(df["date"])
+    if "id" in df:
+        df.index = pd.Index(df.pop("id"), dtype=object, name=None)
+    return df
+
+
+# ---------- PARQUET BACKEND ----------
+class ParquetLedgerStore(LedgerStore):
+    """Columnar ledger: dictionary-encoded type/category/username, int64
+    paise and date32.
+
+    Summaries read only the columns they use, and date filters are pushed
+    down to row groups. Parquet files are immutable, so `append` rewrites
+    the file; bulk loads should go through `extend` or `convert`. Each
+    read-modify-write holds the ledger lock, so writers in other processes
+    cannot lose each other's rows. A `read_only` store leaves files
+    without ids as they are.
+    """
+
+    def __init__(self, path, read_only=False):
+        if pa is None:
+            raise ImportError("Parquet ledgers need pyarrow: pip install pyarrow")
+        self.path = path
+        self.read_only = read_only
+
+    def fingerprint(self):
+        return tuple(file_fingerprint(self.path)) if os.path.exists(self.path) else None
+
+    def ensure(self):
+        if not os.path.exists(self.path):
+            self._write(parquet_schema().empty_table())
+
+    def is_empty(self):
+        if not os.path.exists(self.path) or pq.ParquetFile(self.path).metadata.num_rows == 0:
+            return True
+        if not self.read_only:
+            self._upgrade()
+        return False
+
+    def _upgrade(self):
+        # Files written before transactions had ids get them once.
+        if "id" in pq.read_schema(self.path).names:
+            return
+        with locked(self.path):
+            table = pq.read_table(self.path)
+            if "id" in table.column_names:
+                return
+            ids = pa.array([new_id() for _ in range(table.num_rows)], pa.string())
+            self._write(table.append_column("id", ids).cast(parquet_schema()))
+
+    def _write(self, table):
+        with locked(self.path):
+            tmp_path = self.path + ".tmp"
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, self.path)
+            bump_version(self.path)
+
+    def _table(self, columns=None, username=None, start=None, end=None):
+        filters = []
+        if username is not None:
+            filters.append(("username", "=", username))
+        if start is not None:
+            filters.append(("date", ">=", pd.Timestamp(start).date()))
+        if end is not None:
+            filters.append(("date", "<", pd.Timestamp(end).date()))
+        return pq.read_table(self.path, columns=columns, filters=filters or None)
+
+    def _frame(self, columns, username=None, start=None, end=None, month=None):
+        # Column-pruned, filter-pushed-down read for the aggregate queries.
+        if self.is_empty():
+            return empty_frame()
+        if month is not None and columns is not None and "date" not in columns:
+            columns = columns + ["date"]
+        df = from_table(self._table(columns, username, start, end))
+        if month is not None:
+            df = df[df["date"].dt.month == month]
+        return df
+
+    def read(self, username=None, start=None, end=None, month=None):
+        if self.is_empty():
+            return empty_frame()
+        return self._frame(None, username, start, end, month)[FIELDS]
+
+    def extend(self, rows):
+        rows = [with_id(row) for row in rows]
+        if not rows:
+            return []
+        new = pd.DataFrame(rows).set_index("id").reindex(columns=FIELDS)
+        new["amount"] = pd.to_numeric(new["amount"], errors="coerce")
+        new["date"] = pd.to_datetime(new["date"].map(lambda d: format_date(d, ISO_DATE)),
+                                     format=ISO_DATE, errors="coerce")
+        tables = [to_table(new)]
+        with locked(self.path):
+            if not self.is_empty():
+                tables.insert(0, pq.read_table(self.path).cast(parquet_schema()))
+            self._write(pa.concat_tables(tables).unify_dictionaries().combine_chunks())
+        return [row["id"] for row in rows]
+
+    def append(self, row):
+        return self.extend([row])[0]
+
+    def _keep(self, mask):
+        table = pq.read_table(self.path)
+        self._write(table.filter(pa.array(mask)))
+
+    def delete(self, ids):
+        drop = {str(i) for i in ids}
+        with locked(self.path):
+            if self.is_empty():
+                return
+            ids = pq.read_table(self.path, columns=["id"]).column("id").to_pylist()
+            self._keep([i not in drop for i in ids])
+
+    def clear(self, username):
+        with locked(self.path):
+            if self.is_empty():
+                return
+            users = pq.read_table(self.path, columns=["username"]).column("username").to_pylist()
+            self._keep([u != username for u in users])
+
+    def totals(self, username=None, start=None, end=None, month=None):
+        df = self._frame(["type", "amount_paise"], username, start, end, month)
+        return df.groupby("type", observed=True)["amount"].sum().to_dict()
+
+    def category_totals(self, t_type, username=None, start=None, end=None, month=None):
+        df = self._frame(["type", "category", "amount_paise"], username, start, end, month)
+        df = df[df["type"] == t_type.lower()]
+        return df.groupby("category", observed=True)["amount"].sum().to_dict()
+
+
+# ---------- CONVERSION ----------
+def convert(source, dest, **csv_options):
+    """Write the ledger at `source` (any backend) to the Parquet file `dest`."""
+    df = open_store(source, **csv_options).read()
+    ParquetLedgerStore(dest)._write(to_table(df))
+    return len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a ledger to Parquet.")
+    parser.add_argument("source", help="ledger to read, e.g. data/sandesh_transactions.csv")
+    parser.add_argument("dest", nargs="?", help="defaults to the source path with a .parquet extension")
+    parser.add_argument("--date-format", default=ISO_DATE)
+    args = parser.parse_args()
+
+    dest = args.dest or os.path.splitext(args.source)[0] + ".parquet"
+    count = convert(args.source, dest, date_format=args.date_format)
+    print(f"✅ {args.source}: {count} rows -> {dest}")
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import os
+import re
+
+from ledger_store import CLI_COLUMNS, ISO_DATE, CsvLedgerStore, LedgerStore, empty_frame, new_id, with_id
+from ledger_totals import merge_rollups, month_key
+
+PARTITION_RE = re.compile(r"^(\d{4}-\d{2})\.csv$")
+UNDATED = "undated"
+# Written by `ensure`, so a partition directory is known before its first row.
+MARKER = ".partitions"
+
+
+# ---------- PARTITIONED CSV BACKEND ----------
+class PartitionedCsvLedgerStore(LedgerStore):
+    """One CSV per calendar month, e.g. `data/<user>/2025-11.csv`.
+
+    Each row goes to its month's file, and range/month queries open only
+    the files they need. Rows whose date cannot be parsed go to
+    `undated.csv`, which counts for all-time queries only. With
+    `read_only`, each month file is opened as a read-only CsvLedgerStore.
+    """
+
+    def __init__(self, directory, columns=None, date_format=ISO_DATE, read_only=False):
+        self.path = directory
+        self.columns = list(columns or CLI_COLUMNS)
+        self.date_format = date_format
+        self.read_only = read_only
+        self._stores = {}
+
+    def _store(self, name):
+        if name not in self._stores:
+            self._stores[name] = CsvLedgerStore(os.path.join(self.path, f"{name}.csv"),
+                                                columns=self.columns, date_format=self.date_format,
+                                                read_only=self.read_only)
+        return self._stores[name]
+
+    def partitions(self):
+        if not os.path.isdir(self.path):
+            return []
+        names = [m.group(1) for m in map(PARTITION_RE.match, os.listdir(self.path)) if m]
+        if os.path.exists(os.path.join(self.path, f"{UNDATED}.csv")):
+            names.append(UNDATED)
+        return sorted(names)
+
+    def _select(self, start=None, end=None, month=None):
+        # Yields (store, whole) where `whole` means every row in the partition
+        # matches, so the caller can skip the per-row filter.
+        import pandas as pd
+
+        first = pd.Timestamp(start).strftime("%Y-%m") if start is not None else None
+        last = (pd.Timestamp(end) - pd.Timedelta(1)).strftime("%Y-%m") if end is not None else None
+        for name in self.partitions():
+            if name == UNDATED:
+                if start is None and end is None and month is None:
+                    yield self._store(name), True
+                continue
+            if (first and name < first) or (last and name > last):
+                continue
+            if month is not None and int(name[5:7]) != month:
+                continue
+            yield self._store(name), name != first and name != last
+
+    def fingerprint(self):
+        stamps = [self._store(name).fingerprint() for name in self.partitions()]
+        return tuple(stamps) or None
+
+    def ensure(self):
+        os.makedirs(self.path, exist_ok=True)
+        open(os.path.join(self.path, MARKER), "a").close()
+
+    def is_empty(self):
+        return all(self._store(name).is_empty() for name in self.partitions())
+
+    def append(self, row):
+        return self.extend([row])[0]
+
+    def extend(self, rows):
+        rows = [with_id(row) for row in rows]
+        by_partition = {}
+        for row in rows:
+            name = month_key(row.get("date", ""), self.date_format) or UNDATED
+            by_partition.setdefault(name, []).append(row)
+        if by_partition:
+            self.ensure()
+        for name, batch in by_partition.items():
+            self._store(name).extend(batch)
+        return [row["id"] for row in rows]
+
+    def read(self, username=None, start=None, end=None, month=None):
+        import pandas as pd
+
+        frames = []
+        for store, whole in self._select(start, end, month):
+            frames.append(store.read(username) if whole else store.read(username, start, end))
+        return pd.concat(frames) if frames else empty_frame()
+
+    def delete(self, ids):
+        # Only partitions that hold one of the ids get rewritten.
+        for name in self.partitions():
+            self._store(name).delete(ids)
+
+    def clear(self, username):
+        for name in self.partitions():
+            self._store(name).clear(username)
+
+    def totals(self, username=None, start=None, end=None, month=None):
+        result = {}
+        for store, whole in self._select(start, end, month):
+            part = store.totals(username) if whole else store.totals(username, start, end)
+            for t_type, amount in part.items():
+                result[t_type] = result.get(t_type, 0.0) + amount
+        return result
+
+    def category_totals(self, t_type, username=None, start=None, end=None, month=None):
+        result = {}
+        for store, whole in self._select(start, end, month):
+            if whole:
+                part = store.category_totals(t_type, username)
+            else:
+                part = store.category_totals(t_type, username, start, end)
+            for category, amount in part.items():
+                result[category] = result.get(category, 0.0) + amount
+        return result
+
+    def rollup(self, granularity="month", username=None):
+        # Each month's sidecar rolls up its own rows; undated.csv has none to add.
+        return merge_rollups(self._store(name).rollup(granularity, username)
+                             for name in self.partitions() if name != UNDATED)
+
+
+# ---------- MIGRATION ----------
+def holds_partitions(directory):
+    """Whether `directory` is a partitioned ledger rather than some other folder."""
+    if not os.path.isdir(directory):
+        return False
+    names = os.listdir(directory)
+    return MARKER in names or f"{UNDATED}.csv" in names or any(map(PARTITION_RE.match, names))
+
+
+def partition_dir_for(flat_path):
+    # data/sandesh_transactions.csv -> data/sandesh
+    base = os.path.splitext(os.path.basename(flat_path))[0]
+    if base.endswith("_transactions"):
+        base = base[: -len("_transactions")]
+    return os.path.join(os.path.dirname(flat_path), base)
+
+
+def migrate_flat_file(flat_path, directory=None, columns=None, date_format=ISO_DATE):
+    """Copy a flat ledger into month partitions; the flat file is left as is.
+
+    Rows are streamed, so memory does not depend on the ledger size. Extra
+    columns such as the old `month`/`year` ones are dropped because the
+    partition already records them.
+    """
+    directory = directory or partition_dir_for(flat_path)
+    store = PartitionedCsvLedgerStore(directory, columns=columns, date_format=date_format)
+    if store.partitions():
+        raise FileExistsError(f"{directory} already holds partitions")
+    store.ensure()
+
+    fields = [c.lower() for c in store.columns]
+    handles, writers, count = {}, {}, 0
+    try:
+        with open(flat_path, newline="") as f:
+            for raw in csv.DictReader(f):
+                row = {str(k).lower(): v for k, v in raw.items() if k is not None}
+                name = month_key(row.get("date", ""), date_format) or UNDATED
+                if name not in writers:
+                    handles[name] = open(os.path.join(directory, f"{name}.csv"), "w", newline="")
+                    writers[name] = csv.writer(handles[name])
+                    writers[name].writerow(store.columns)
+                row["id"] = row.get("id") or new_id()
+                writers[name].writerow([row.get(field) or "" for field in fields])
+                count += 1
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return directory, count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split flat ledgers into month partitions.")
+    parser.add_argument("ledgers", nargs="+", help="flat ledger CSVs, e.g. data/sandesh_transactions.csv")
+    parser.add_argument("--date-format", default=ISO_DATE)
+    args = parser.parse_args()
+
+    for flat_path in args.ledgers:
+        try:
+            directory, count = migrate_flat_file(flat_path, date_format=args.date_format)
+        except OSError as exc:
+            print(f"⚠️ Skipped {flat_path}: {exc}")
+            continue
+        print(f"✅ {flat_path}: {count} rows -> {directory}/ (the flat file is no longer read and can be archived)")
@@ -0,0 +1,169 @@
+import atexit
+import os
+import queue
+import threading
+from collections import deque
+
+from ledger_metrics import operation
+from ledger_store import LedgerStore, with_id
+
+
+# ---------- WRITE-BEHIND QUEUE ----------
+class WriteBehindLedgerStore(LedgerStore):
+    """Write-behind queue in front of another store, for the save buttons.
+
+    `append`/`extend` give rows their ids, queue them and return at once.
+    A background thread takes whatever has piled up and writes it with a
+    single `base.extend`. It waits up to `linger` seconds after the first
+    row, so a burst of saves becomes one write. At most `max_pending` rows
+    wait; past that, appends block until the worker catches up, or raise
+    queue.Full once `timeout` runs out.
+
+    Every other call flushes the queue first and then goes to `base`. A
+    read sees the rows saved before it, and a delete or clear comes after
+    them. A write that fails with an OSError keeps its rows at the head of
+    the queue and is retried every `retry_interval` seconds; any other
+    failure is not retried, and `failed` maps the ids of the rows it
+    dropped to the exception. `error` holds the last failure, and
+    `on_error(exc)` is called from the worker thread. `close` (also run at
+    exit) writes out whatever is left.
+    """
+
+    def __init__(self, base, max_pending=1000, linger=0.02, retry_interval=1.0, on_error=None):
+        self.base = base
+        self.path = base.path
+        self.max_pending = max_pending
+        self.linger = linger
+        self.retry_interval = retry_interval
+        self.on_error = on_error
+        self.error = None
+        self.failed = {}  # id -> exception, for rows dropped after a failure
+
+        self._pending = deque()
+        self._writing = 0  # rows the worker has taken but not written yet
+        self._retrying = False  # the worker is waiting to write failed rows again
+        self._closed = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._background, name="ledger-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # ----- queueing -----
+    def extend(self, rows, timeout=None):
+        rows = [with_id(row) for row in rows]
+        if not rows:
+            return []
+        with self._cond:
+            if self._closed:
+                return self.base.extend(rows)
+
+            def room():
+                # A batch bigger than the queue waits for it to drain completely.
+                queued = len(self._pending) + self._writing
+                return queued == 0 or queued + len(rows) <= self.max_pending
+
+            if not self._cond.wait_for(room, timeout):
+                raise queue.Full(f"{self.pending()} transactions are still waiting to be written")
+            self._pending.extend(rows)
+            self._cond.notify_all()
+        return [row["id"] for row in rows]
+
+    def append(self, row, timeout=None):
+        return self.extend([row], timeout)[0]
+
+    def pending(self):
+        """Rows acknowledged but not yet written."""
+        with self._cond:
+            return len(self._pending) + self._writing
+
+    def _background(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                # Let the rest of a burst arrive, unless the queue is full or closing.
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= self.max_pending, self.linger)
+                batch = list(self._pending)
+                self._pending.clear()
+                self._writing = len(batch)
+                self._retrying = False
+            error, retry = None, False
+            try:
+                with operation("save", os.path.basename(self.path)):
+                    self.base.extend(batch)
+            except OSError as exc:  # the rows were acknowledged: keep them and retry
+                error, retry = exc, True
+            except Exception as exc:  # bad rows fail the same way every time
+                error = exc
+            with self._cond:
+                self._writing = 0
+                self.error = error
+                self._retrying = retry
+                if retry:
+                    self._pending.extendleft(reversed(batch))
+                elif error is not None:
+                    self.failed.update((row["id"], error) for row in batch)
+                self._cond.notify_all()
+            if error is not None and self.on_error is not None:
+                self.on_error(error)
+            if retry:
+                with self._cond:
+                    if self._cond.wait_for(lambda: self._closed, self.retry_interval):
+                        return  # closing: leave the rows queued rather than retry forever
+
+    def flush(self, timeout=None):
+        """Wait until every queued row is written; False if any was dropped, writes are failing or `timeout` ran out."""
+        with self._cond:
+            failed = len(self.failed)
+            return self._cond.wait_for(
+                lambda: not self._writing and (not self._pending or self._retrying), timeout
+            ) and not self._pending and len(self.failed) == failed
+
+    def close(self, timeout=None):
+        """Write out what is queued and stop the worker; False if rows could not be written."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+        return self.pending() == 0
+
+    # ----- LedgerStore interface -----
+    def ensure(self):
+        self.base.ensure()
+
+    def is_empty(self):
+        self.flush()
+        return self.base.is_empty()
+
+    def fingerprint(self):
+        self.flush()
+        return self.base.fingerprint()
+
+    def read(self, username=None, start=None, end=None, month=None):
+        self.flush()
+        return self.base.read(username, start, end, month)
+
+    def delete(self, ids):
+        self.flush()
+        self.base.delete(ids)
+
+    def clear(self, username):
+        self.flush()
+        self.base.clear(username)
+
+    def totals(self, username=None, start=None, end=None, month=None):
+        self.flush()
+        return self.base.totals(username, start, end, month)
+
+    def category_totals(self, t_type, username=None, start=None, end=None, month=None):
+        self.flush()
+        return self.base.category_totals(t_type, username, start, end, month)
+
+    def rollup(self, granularity="month", username=None):
+        self.flush()
+        return self.base.rollup(granularity, username)
+
+    def period_total(self, period, t_type, category, username=None, granularity="month"):
+        self.flush()
+        return self.base.period_total(period, t_type, category, username, granularity)
@@ -0,0 +1,174 @@
+import csv
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from ledger_metrics import timed
+
+# ---------- SCHEMA ----------
+# Every backend hands rows back with these lowercase column names and
+# dtypes, whatever the file looks like. The frame's index is the
+# transaction's stable id. `type` is lowercased; `type` and `category` stay
+# NaN when missing so such rows drop out of totals, while `description` and
+# `username` read as "".
+FIELDS = ["type", "category", "amount", "date", "description", "username"]
+DTYPES = {"type": "object", "category": "object", "amount": "float64", "date": "datetime64[ns]",
+          "description": "object", "username": "object"}
+ISO_DATE = "%Y-%m-%d"
+# Date formats found in ledgers, most likely first; a file's own is picked
+# from its rows, the others only rescue rows written differently.
+DATE_FORMATS = (ISO_DATE, "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y")
+SAMPLE_ROWS = 200
+FRAME_CACHE_SIZE = 8
+
+
+class Layout:
+    """How one ledger CSV spells things: its header as written and its date format.
+
+    `detected` is False when the file had no dated rows to go by, so the
+    date format is only the caller's default.
+    """
+
+    __slots__ = ("columns", "date_format", "detected")
+
+    def __init__(self, columns, date_format=ISO_DATE, detected=False):
+        self.columns = list(columns)
+        self.date_format = date_format
+        self.detected = detected
+
+    @property
+    def fields(self):
+        return [str(c).strip().lower() for c in self.columns]
+
+    @property
+    def key(self):
+        return tuple(self.columns), self.date_format
+
+    def __repr__(self):
+        return f"Layout({self.columns!r}, {self.date_format!r}, detected={self.detected})"
+
+
+def detect_date_format(values, default=ISO_DATE):
+    """The format in DATE_FORMATS that reads the most of `values`; `default` wins ties."""
+    values = [v.strip() for v in values if v and v.strip()]
+    best, best_count = default, -1
+    for fmt in (default,) + tuple(f for f in DATE_FORMATS if f != default):
+        count = 0
+        for value in values:
+            try:
+                datetime.strptime(value, fmt)
+                count += 1
+            except ValueError:
+                pass
+        if count > best_count:
+            best, best_count = fmt, count
+    return best
+
+
+def detect_layout(path, columns, date_format=ISO_DATE):
+    """Layout of the CSV at `path`, from its header and first SAMPLE_ROWS rows.
+
+    `columns` and `date_format` describe a file that does not exist yet, or
+    has no header or dated rows to go by.
+    """
+    try:
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            sample = [row for _, row in zip(range(SAMPLE_ROWS), reader) if row]
+    except FileNotFoundError:
+        header = None
+    if not header:
+        return Layout(columns, date_format)
+    fields = [h.strip().lower() for h in header]
+    if "date" not in fields:
+        return Layout(header, date_format)
+    at = fields.index("date")
+    dates = [row[at] for row in sample if len(row) > at and row[at].strip()]
+    if not dates:
+        return Layout(header, date_format)
+    return Layout(header, detect_date_format(dates, date_format), detected=True)
+
+
+# ---------- NORMALIZING ----------
+def parse_dates(values, date_format):
+    """Strings -> datetime64 with explicit formats only: the file's, then the other known ones."""
+    import pandas as pd
+
+    dates = pd.to_datetime(values, format=date_format, errors="coerce")
+    text = values.fillna("").astype(str).str.strip()
+    missing = dates.isna() & (text != "")
+    for fmt in DATE_FORMATS:
+        if not missing.any():
+            break
+        if fmt != date_format:
+            dates[missing] = pd.to_datetime(text[missing], format=fmt, errors="coerce")
+            missing = dates.isna() & (text != "")
+    return dates
+
+
+def normalize_frame(df, layout):
+    """Frame of strings in `layout` -> the canonical schema (FIELDS, DTYPES) indexed by id."""
+    import pandas as pd
+
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    ids = df["id"] if "id" in df else pd.Series(index=df.index, dtype=object)
+    ids = ids.where(ids.notna() & (ids.astype(str) != ""), pd.Series([f"row{i}" for i in range(len(df))],
+                                                                      index=df.index))
+    df = df.reindex(columns=FIELDS)
+    df.index = pd.Index(ids.astype(str), dtype=object, name=None)
+    text = {column: df[column].fillna("").astype(str)
+            for column in ("type", "category", "description", "username")}
+    df["type"] = text["type"].str.strip().str.lower()
+    df["category"] = text["category"].str.strip()
+    for column in ("type", "category"):
+        df[column] = df[column].where(df[column] != "")
+    df["description"], df["username"] = text["description"], text["username"]
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+    df["date"] = parse_dates(df["date"], layout.date_format)
+    return df.astype(DTYPES)
+
+
+def read_frame(path, layout):
+    """Parse a ledger CSV: every cell read as a string (no dtype guessing), extra columns skipped."""
+    import pandas as pd
+
+    wanted = set(FIELDS) | {"id"}
+    with timed("load"):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, engine="c",
+                         usecols=lambda c: str(c).strip().lower() in wanted)
+    with timed("parse"):
+        return normalize_frame(df, layout)
+
+
+# ---------- CACHE ----------
+# Normalized frames shared by every store object in the process (the Tk
+# window, its watcher and search index each open their own), keyed by the
+# file's path and kept until its size or mtime changes. Callers must not
+# modify them.
+_frames = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def load_frame(path, layout, stamp):
+    """Normalized frame for the CSV at `path` whose size and mtime are `stamp`."""
+    key = os.path.abspath(path)
+    with _frames_lock:
+        cached = _frames.get(key)
+        if cached is not None and cached[0] == (stamp, layout.key):
+            _frames.move_to_end(key)
+            return cached[1]
+    df = read_frame(path, layout)
+    with _frames_lock:
+        _frames[key] = ((stamp, layout.key), df)
+        _frames.move_to_end(key)
+        while len(_frames) > FRAME_CACHE_SIZE:
+            _frames.popitem(last=False)
+    return df
+
+
+def clear_frame_cache():
+    """Forget every cached frame, so the next read parses its file again (for cold benchmarks)."""
+    with _frames_lock:
+        _frames.clear()
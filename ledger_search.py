@@ -0,0 +1,405 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+from calendar import monthrange
+from datetime import date as date_cls, datetime, timedelta
+
+from ledger_lock import locked
+from ledger_metrics import phase
+from ledger_model import NO_DATE, PAISE, Ledger, to_ordinal
+from ledger_store import CsvLedgerStore
+from ledger_totals import file_fingerprint
+from ledger_watch import CsvTail, csv_records
+
+TOKEN_RE = re.compile(r"\w+")
+RELATIVE_RE = re.compile(r"\b(?:last|past)\s+(\d+)\s+(day|week|month|year)s?\b")
+THIS_RE = re.compile(r"\bthis\s+(week|month|year)\b")
+FILTER_RE = re.compile(r"\b(category|cat|type):(\S+)")
+# A term matching more than this share of a ledger's rows is checked on the
+# rows read rather than looked up: newest first, hits turn up within a few rows.
+BROAD_TERM = 0.05
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def months_ago(day, months):
+    total = day.year * 12 + day.month - 1 - months
+    year, month = divmod(total, 12)
+    return day.replace(year=year, month=month + 1, day=min(day.day, monthrange(year, month + 1)[1]))
+
+
+def parse_query(text, today=None):
+    """ "vada pav last 6 months category:Food" -> terms plus filters.
+
+    Understands `last|past N days|weeks|months|years`, `this week|month|year`,
+    `category:<name>` (or `cat:`) and `type:income|expense`; every other word
+    is a search term, matched as a prefix of a description word.
+    """
+    today = today or date_cls.today()
+    query = {"terms": [], "start": None, "category": None, "type": None}
+    text = text.lower()
+
+    def relative(match):
+        count, unit = int(match.group(1)), match.group(2)
+        if unit in ("day", "week"):
+            query["start"] = today - timedelta(days=count * (7 if unit == "week" else 1))
+        else:
+            query["start"] = months_ago(today, count * (12 if unit == "year" else 1))
+        return " "
+
+    def this(match):
+        unit = match.group(1)
+        if unit == "week":
+            query["start"] = today - timedelta(days=today.weekday())
+        else:
+            query["start"] = today.replace(day=1, month=1 if unit == "year" else today.month)
+        return " "
+
+    def field(match):
+        query["category" if match.group(1) != "type" else "type"] = match.group(2)
+        return " "
+
+    text = RELATIVE_RE.sub(relative, text)
+    text = THIS_RE.sub(this, text)
+    text = FILTER_RE.sub(field, text)
+    query["terms"] = tokenize(text)
+    return query
+
+
+# ---------- INVERTED INDEX ----------
+class SearchIndex:
+    """Description words -> the transactions that use them.
+
+    Each transaction is a document numbered in the order it was added;
+    `postings` maps a word to its documents in that order, and the sorted
+    vocabulary answers prefix lookups with a binary search. The document
+    keeps the row itself, so filtering and showing hits never goes back to
+    the ledger. Nothing is ever removed: a rewritten ledger is re-indexed.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.docs = []  # [day ordinal, type, category, amount, description, username]
+        self.postings = {}
+        self._vocab = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, row_id, day, t_type, category, amount, description, username=""):
+        doc = len(self.ids)
+        self.ids.append(row_id)
+        self.docs.append([day, t_type.lower(), category, amount, description, username])
+        for token in set(tokenize(description)):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = []
+                insort(self._vocab, token)
+            posting.append(doc)
+
+    def add_ledger(self, ledger):
+        types, categories, users = ledger.types.values, ledger.categories.values, ledger.users.values
+        for i in range(len(ledger)):
+            self.add(ledger.ids[i], ledger.days[i], types[ledger.type_codes[i]],
+                     categories[ledger.category_codes[i]], ledger.paise[i] / PAISE,
+                     ledger.descriptions[i], users[ledger.user_codes[i]])
+
+    def _matching(self, term):
+        docs = set()
+        i = bisect_left(self._vocab, term)
+        while i < len(self._vocab) and self._vocab[i].startswith(term):
+            docs.update(self.postings[self._vocab[i]])
+            i += 1
+        return docs
+
+    def search(self, terms=(), username=None, start=None, end=None, category=None, t_type=None):
+        """Documents matching every term (as a word prefix) and filter, newest first."""
+        if terms:
+            matches = sorted((self._matching(term) for term in terms), key=len)
+            docs = matches[0].intersection(*matches[1:])
+        else:
+            docs = range(len(self.docs))
+        first = to_ordinal(start) if start is not None else None
+        last = to_ordinal(end) if end is not None else None
+        category = category.lower() if category is not None else None
+        t_type = t_type.lower() if t_type is not None else None
+        hits = []
+        for doc in docs:
+            day, row_type, row_category, _, _, row_user = self.docs[doc]
+            if username is not None and row_user != username:
+                continue
+            if first is not None and day < first:
+                continue
+            if last is not None and (day >= last or day == NO_DATE):
+                continue
+            if (category is not None and row_category.lower() != category) or (t_type is not None and row_type != t_type):
+                continue
+            hits.append(doc)
+        hits.sort(key=lambda doc: (self.docs[doc][0], self.ids[doc]), reverse=True)
+        return hits
+
+    def row(self, doc):
+        day, t_type, category, amount, description, username = self.docs[doc]
+        return {"id": self.ids[doc], "type": t_type, "category": category, "amount": amount,
+                "date": date_cls.fromordinal(day) if day != NO_DATE else None,
+                "description": description, "username": username}
+
+
+# ---------- ON-DISK INDEX ----------
+def _hit(values, date_format):
+    # One raw CSV row, as the file spells it -> a search hit.
+    try:
+        amount = float(values.get("amount", ""))
+    except ValueError:
+        amount = 0.0
+    try:
+        day = datetime.strptime(values.get("date", ""), date_format).date()
+    except ValueError:
+        day = None
+    return {"id": values.get("id", ""), "type": values.get("type", "").lower(), "category": values.get("category", ""),
+            "amount": amount, "date": day, "description": values.get("description", ""),
+            "username": values.get("username", "")}
+
+
+class CsvSearchIndex:
+    """Description words -> rows of a CSV ledger, in a `.search.db` SQLite sidecar.
+
+    A row is known by its byte offset in the ledger, and the sidecar holds
+    only words and dates, never the rows: hits come newest first from the
+    date index, and each one is read from the ledger by seeking to it, so a
+    query reads about as many rows as it returns. `refresh` adds the rows
+    appended since the last one, by any process, in one transaction; a
+    rewritten ledger (delete, clear, compaction) is re-indexed from one
+    pass over the file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rows (offset INTEGER PRIMARY KEY, day INTEGER NOT NULL);
+        CREATE INDEX IF NOT EXISTS idx_rows_day ON rows (day, offset);
+        CREATE TABLE IF NOT EXISTS tokens (id INTEGER PRIMARY KEY, token TEXT NOT NULL UNIQUE);
+        CREATE TABLE IF NOT EXISTS postings (
+            token INTEGER NOT NULL,
+            offset INTEGER NOT NULL,
+            PRIMARY KEY (token, offset)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.path + ".search.db"
+        try:
+            self._conn = self._open(self.path)
+        except sqlite3.Error:
+            # Read-only data dir: the index lives in memory for this process.
+            self._conn = self._open(":memory:")
+        self._fields = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _open(cls, path):
+        # One connection, shared by the Tk app's worker threads under _lock;
+        # transactions are begun by hand.
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.executescript(cls.SCHEMA)
+        return conn
+
+    def close(self):
+        self._conn.close()
+
+    def refresh(self):
+        """Catch up with the ledger; True if the index changed."""
+        path = self.store.path
+        with locked(path, shared=True), self._lock:
+            stamp = file_fingerprint(path) if os.path.exists(path) else None
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM state WHERE key = 'position'").fetchone()
+                state = json.loads(row[0]) if row else {"fingerprint": None, "tail": None}
+                tail = CsvTail(state["tail"])
+                if stamp == state["fingerprint"]:
+                    conn.execute("COMMIT")
+                    self._fields = tail.fields
+                    return False
+                records = tail.read(path, offsets=True) if stamp is not None else None
+                if records is None:
+                    for table in ("rows", "tokens", "postings"):
+                        conn.execute(f"DELETE FROM {table}")
+                    records = []
+                    if stamp is not None:
+                        tail.reset(path)
+                        records = self._scan(path, tail.fields)
+                self._add(records)
+                conn.execute("INSERT OR REPLACE INTO state VALUES ('position', ?)",
+                             (json.dumps({"fingerprint": stamp, "tail": tail.state() if stamp else None}),))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._fields = tail.fields
+            return True
+
+    @staticmethod
+    def _scan(path, fields):
+        with open(path, "rb") as f:
+            f.readline()
+            yield from csv_records(f, fields, f.tell())
+
+    @phase("parse")
+    def _add(self, records):
+        date_format = self.store.layout.date_format
+        rows, postings = [], []
+        for offset, values in records:
+            try:
+                day = datetime.strptime(values.get("date", ""), date_format).toordinal()
+            except ValueError:
+                day = NO_DATE
+            rows.append((offset, day))
+            postings.extend((token, offset) for token in set(tokenize(values.get("description", ""))))
+        conn = self._conn
+        conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?)", rows)
+        # Words are stored once; postings refer to them by number.
+        words = sorted({token for token, _ in postings})
+        conn.executemany("INSERT OR IGNORE INTO tokens (token) VALUES (?)", ((word,) for word in words))
+        ids = {}
+        for i in range(0, len(words), 500):
+            chunk = words[i:i + 500]
+            ids.update(conn.execute(f"SELECT token, id FROM tokens WHERE token IN ({', '.join('?' * len(chunk))})",
+                                    chunk))
+        conn.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)",
+                         sorted((ids[token], offset) for token, offset in postings))
+
+    def search(self, terms=(), username=None, start=None, end=None, category=None, t_type=None, limit=None):
+        """Rows matching every term (as a word prefix) and filter, newest first."""
+        path = self.store.path
+        # Held throughout, so no rewrite moves the rows between the lookup and the reads.
+        with locked(path, shared=True):
+            self.refresh()
+            if not os.path.exists(path):
+                return []
+            clauses, params, broad = [], [], []
+            with self._lock:
+                cap = int(self._conn.execute("SELECT count(*) FROM rows").fetchone()[0] * BROAD_TERM)
+                for term in terms:
+                    # Every token starting with `term` sorts in [term, term with its last letter bumped).
+                    postings = ("SELECT offset FROM postings WHERE token IN "
+                                "(SELECT id FROM tokens WHERE token >= ? AND token < ?)")
+                    bounds = [term, term[:-1] + chr(ord(term[-1]) + 1)]
+                    count = self._conn.execute(f"SELECT count(*) FROM ({postings} LIMIT ?)", bounds + [cap + 1])
+                    if count.fetchone()[0] > cap:
+                        broad.append(term)
+                    else:
+                        clauses.append(f"offset IN ({postings})")
+                        params += bounds
+            if start is not None:
+                clauses.append("day >= ?")
+                params.append(to_ordinal(start))
+            if end is not None:
+                clauses.append("day < ? AND day != ?")
+                params += [to_ordinal(end), NO_DATE]
+            where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+            category = category.lower() if category is not None else None
+            t_type = t_type.lower() if t_type is not None else None
+            date_format = self.store.layout.date_format
+            hits = []
+            with self._lock, open(path, "rb") as f:
+                for (offset,) in self._conn.execute(f"SELECT offset FROM rows{where} ORDER BY day DESC, offset DESC",
+                                                    params):
+                    f.seek(offset)
+                    hit = _hit(next(csv_records(f, self._fields, offset))[1], date_format)
+                    if broad:
+                        words = tokenize(hit["description"])
+                        if not all(any(word.startswith(term) for word in words) for term in broad):
+                            continue
+                    if username is not None and hit["username"] != username:
+                        continue
+                    if (category is not None and hit["category"].lower() != category) or (
+                            t_type is not None and hit["type"] != t_type):
+                        continue
+                    hits.append(hit)
+                    if limit is not None and len(hits) >= limit:
+                        break
+            return hits
+
+
+# ---------- LEDGER SEARCH ----------
+class LedgerSearch:
+    """Description search kept in step with a ledger store.
+
+    CSV ledgers are indexed on disk (CsvSearchIndex), so a fresh CLI
+    process answers without reading the ledger, and a refresh only indexes
+    the rows appended since. Other backends keep a SearchIndex in memory,
+    re-indexed from a full read whenever their fingerprint moves; callers
+    that already hold the rows as a Ledger can pass it instead, and callers
+    that append through another store object can hand the rows to `add`.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.disk = CsvSearchIndex(store) if isinstance(store, CsvLedgerStore) else None
+        self.index = SearchIndex()
+        self.fingerprint = None
+        self._lock = threading.Lock()
+
+    @phase("load")
+    def refresh(self, ledger=None, fingerprint=None):
+        """Catch up with the store; True if the index changed.
+
+        `ledger` is the store's rows as of `fingerprint`, used instead of
+        reading them again when an in-memory index has to be rebuilt.
+        """
+        if self.disk is not None:
+            return self.disk.refresh()
+        with self._lock:
+            stamp = fingerprint if ledger is not None else self.store.fingerprint()
+            if stamp == self.fingerprint:
+                return False
+            self._rebuild(ledger)
+            self.fingerprint = stamp
+            return True
+
+    @phase("parse")
+    def _rebuild(self, ledger=None):
+        self.index = SearchIndex()
+        if ledger is None:
+            ledger = Ledger.from_frame(self.store.read())
+        self.index.add_ledger(ledger)
+
+    def add(self, rows, since):
+        """Index rows the caller just appended; `since` is the store's fingerprint from before.
+
+        If anything else was written in between, the next refresh rebuilds
+        instead. CSV ledgers pick new rows up from the file on refresh.
+        """
+        if self.disk is not None:
+            return
+        with self._lock:
+            if since != self.fingerprint:
+                return
+            for row in rows:
+                self.index.add(row["id"], to_ordinal(row.get("date")), str(row.get("type", "")),
+                               row.get("category", ""), float(row.get("amount", 0)),
+                               row.get("description", ""), row.get("username", ""))
+            self.fingerprint = self.store.fingerprint()
+
+    @phase("filter")
+    def search(self, text, username=None, start=None, end=None, category=None, t_type=None, limit=None):
+        """Rows matching a query such as "vada pav last 6 months", newest first.
+
+        Filters in the query narrow the ones passed in: the later start wins.
+        """
+        query = parse_query(text)
+        if query["start"] is not None and (start is None or to_ordinal(query["start"]) > to_ordinal(start)):
+            start = query["start"]
+        args = (query["terms"], username, start, end, query["category"] or category, query["type"] or t_type)
+        if self.disk is not None:
+            return self.disk.search(*args, limit=limit)
+        with self._lock:
+            docs = self.index.search(*args)
+            return [self.index.row(doc) for doc in docs[:limit]]
@@ -0,0 +1,219 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+
+from ledger_lock import locked
+from ledger_store import ISO_DATE, CsvLedgerStore, LedgerStore, empty_frame, new_id, with_id
+from ledger_totals import file_fingerprint, merge_rollups
+
+INDEX_FILE = "users.json"
+SHARD_SUFFIX = "_transactions.csv"
+CHUNK_SIZE = 5000
+
+
+def shard_name(username):
+    """`<user>_transactions.csv`; names that are not file-safe get a hash so they cannot collide."""
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", username)
+    if safe != username or not safe:
+        safe = f"{safe}-{hashlib.sha1(username.encode('utf-8')).hexdigest()[:8]}"
+    return safe + SHARD_SUFFIX
+
+
+# ---------- SHARDED BACKEND ----------
+class ShardedLedgerStore(LedgerStore):
+    """One ledger file per user, `<directory>/<user>_transactions.csv`, as the Tk app keeps them.
+
+    `users.json` maps each username to its shard, so looking a user up
+    never lists the directory or opens anyone else's file. Reads, totals
+    and mutations that name a username touch only that shard; calls
+    without one (an export, say) visit every shard. `shard_factory` builds
+    the store for a shard path, by default a CsvLedgerStore with the given
+    `columns` and `date_format`.
+    """
+
+    def __init__(self, directory, columns=None, date_format=ISO_DATE, shard_factory=None):
+        self.path = directory
+        self.columns = columns
+        self.date_format = date_format
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.shard_factory = shard_factory or (
+            lambda path: CsvLedgerStore(path, columns=columns, date_format=date_format))
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._index = ({}, None)
+
+    # ----- username index -----
+    def users(self):
+        """username -> shard file name; re-read only when another process changed it."""
+        try:
+            stamp = tuple(file_fingerprint(self.index_path))
+        except FileNotFoundError:
+            return {}
+        users, seen = self._index
+        if stamp != seen:
+            with open(self.index_path) as f:
+                users = json.load(f)["users"]
+            self._index = (users, stamp)
+        return users
+
+    def has_user(self, username):
+        return username in self.users()
+
+    def _register(self, usernames):
+        with locked(self.index_path):
+            users = dict(self.users())
+            missing = [u for u in usernames if u not in users]
+            if missing:
+                users.update((u, shard_name(u)) for u in missing)
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"users": users}, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.index_path)
+            return users
+
+    def shard(self, username, create=False):
+        """The store holding `username`'s rows; None for an unknown user unless `create`."""
+        name = self.users().get(username)
+        if name is None:
+            if not create:
+                return None
+            self.ensure()
+            name = self._register([username])[username]
+        with self._lock:
+            if name not in self._shards:
+                self._shards[name] = self.shard_factory(os.path.join(self.path, name))
+            return self._shards[name]
+
+    def _all_shards(self):
+        return [self.shard(username) for username in self.users()]
+
+    # ----- LedgerStore interface -----
+    def ensure(self):
+        os.makedirs(self.path, exist_ok=True)
+
+    def fingerprint(self):
+        stamps = tuple((username, self.shard(username).fingerprint()) for username in sorted(self.users()))
+        return stamps or None
+
+    def is_empty(self):
+        return all(shard.is_empty() for shard in self._all_shards())
+
+    def append(self, row):
+        return self.extend([row])[0]
+
+    def extend(self, rows):
+        rows = [with_id(row) for row in rows]
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row.get("username") or "", []).append(row)
+        if by_user:
+            self.ensure()
+            self._register(list(by_user))
+        for username, batch in by_user.items():
+            self.shard(username).extend(batch)
+        return [row["id"] for row in rows]
+
+    def read(self, username=None, start=None, end=None, month=None):
+        if username is not None:
+            shard = self.shard(username)
+            return shard.read(username, start, end, month) if shard is not None else empty_frame()
+        import pandas as pd
+
+        frames = [shard.read(None, start, end, month) for shard in self._all_shards()]
+        return pd.concat(frames) if frames else empty_frame()
+
+    def delete(self, ids):
+        # Ids do not say whose they are; callers that know should use
+        # shard(username).delete instead of visiting every shard.
+        for shard in self._all_shards():
+            shard.delete(ids)
+
+    def clear(self, username):
+        shard = self.shard(username)
+        if shard is not None:
+            shard.clear(username)
+
+    def totals(self, username=None, start=None, end=None, month=None):
+        if username is None:
+            return super().totals(username, start, end, month)
+        shard = self.shard(username)
+        return shard.totals(username, start, end, month) if shard is not None else {}
+
+    def category_totals(self, t_type, username=None, start=None, end=None, month=None):
+        if username is None:
+            return super().category_totals(t_type, username, start, end, month)
+        shard = self.shard(username)
+        return shard.category_totals(t_type, username, start, end, month) if shard is not None else {}
+
+    def rollup(self, granularity="month", username=None):
+        if username is None:
+            return merge_rollups(shard.rollup(granularity) for shard in self._all_shards())
+        shard = self.shard(username)
+        return shard.rollup(granularity, username) if shard is not None else {}
+
+    def period_total(self, period, t_type, category, username=None, granularity="month"):
+        if username is None:
+            return super().period_total(period, t_type, category, username, granularity)
+        shard = self.shard(username)
+        return shard.period_total(period, t_type, category, username, granularity) if shard is not None else 0.0
+
+
+# ---------- MIGRATION ----------
+def shard_flat_file(flat_path, directory, columns=None, date_format=ISO_DATE):
+    """Split a shared ledger into per-user shards; the flat file is left as is.
+
+    Rows are streamed and written out `CHUNK_SIZE` at a time, so neither
+    memory nor open files grow with the ledger or the number of users.
+    Fold any write-ahead log into the flat file first (WalLedgerStore.compact).
+    """
+    store = ShardedLedgerStore(directory, columns=columns, date_format=date_format)
+    if store.users():
+        raise FileExistsError(f"{directory} already holds shards")
+    store.ensure()
+    header = CsvLedgerStore(flat_path, columns=columns).columns
+    fields = [c.lower() for c in header]
+
+    pending, count, started = {}, 0, set()
+
+    def flush():
+        for username, rows in pending.items():
+            path = os.path.join(directory, shard_name(username))
+            with open(path, "a" if username in started else "w", newline="") as f:
+                writer = csv.writer(f)
+                if username not in started:
+                    writer.writerow(header)
+                    started.add(username)
+                writer.writerows(rows)
+        pending.clear()
+
+    with open(flat_path, newline="") as f:
+        for raw in csv.DictReader(f):
+            row = {str(k).lower(): v for k, v in raw.items() if k is not None}
+            row["id"] = row.get("id") or new_id()
+            pending.setdefault(row.get("username") or "", []).append([row.get(field) or "" for field in fields])
+            count += 1
+            if count % CHUNK_SIZE == 0:
+                flush()
+    flush()
+    store._register(sorted(started))
+    return count, len(started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split a shared ledger into per-user shards.")
+    parser.add_argument("ledger", help="shared ledger CSV, e.g. transactions.csv")
+    parser.add_argument("directory", help="where the shards and users.json go")
+    parser.add_argument("--columns", help="ledger CSV header, e.g. Type,Category,Amount,Date,Description,Username,Id")
+    parser.add_argument("--date-format", default=ISO_DATE)
+    args = parser.parse_args()
+
+    columns = args.columns.split(",") if args.columns else None
+    try:
+        count, users = shard_flat_file(args.ledger, args.directory, columns, args.date_format)
+    except OSError as exc:
+        parser.exit(1, f"⚠️ Sharding failed: {exc}\n")
+    print(f"✅ {args.ledger}: {count} rows -> {users} user shards in {args.directory}/")
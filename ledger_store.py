@@ -0,0 +1,542 @@
+import csv
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date as date_cls, datetime
+from urllib.parse import quote
+
+from ledger_lock import bump_version, locked, optimistic_rewrite
+from ledger_metrics import phase, timed
+from ledger_schema import DTYPES, FIELDS, ISO_DATE, Layout, detect_layout, load_frame, normalize_frame
+from ledger_totals import DAY_GRANULARITIES, RunningTotals, file_fingerprint, frame_rollup, parse_day
+
+# ---------- SCHEMA ----------
+# Every backend hands rows back in the canonical schema of ledger_schema
+# (FIELDS, DTYPES), indexed by the transaction's stable id, whatever the
+# file looks like.
+#
+# pandas is imported inside the functions that build frames: appending a
+# row and the running-totals summaries only need the csv module, and the
+# CLI should not pay for importing pandas on every quick entry.
+CLI_COLUMNS = ["type", "category", "amount", "date", "description", "id"]
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def empty_frame():
+    import pandas as pd
+
+    return pd.DataFrame({f: pd.Series(dtype=DTYPES[f]) for f in FIELDS})
+
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def new_id():
+    """ULID: 48-bit millisecond timestamp plus 80 random bits, base32.
+
+    IDs sort by creation time and need no counter shared between writers.
+    """
+    value = (int(time.time() * 1000) << 80) | int.from_bytes(os.urandom(10), "big")
+    return "".join(_CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+
+def with_id(row):
+    return row if row.get("id") else dict(row, id=new_id())
+
+
+def format_date(value, date_format):
+    if isinstance(value, (datetime, date_cls)):
+        return value.strftime(date_format)
+    return value
+
+
+@phase("filter")
+def filter_frame(df, username=None, start=None, end=None, month=None):
+    import pandas as pd
+
+    if username is not None:
+        df = df[df["username"] == username]
+    if start is not None:
+        df = df[df["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["date"] < pd.Timestamp(end)]
+    if month is not None:
+        df = df[df["date"].dt.month == month]
+    return df
+
+
+# ---------- INTERFACE ----------
+class LedgerStore:
+    """Storage backend shared by the CLI, the Tk app and the Streamlit app.
+
+    `start` is inclusive, `end` exclusive, and `month` (1-12) matches that
+    calendar month in any year, which is what the Tk month picker needs.
+    `append`/`extend` return the ids of the new rows; `read` uses them as
+    the index and `delete` takes them, so deleting never hits a row that
+    moved up after someone else's delete.
+    """
+
+    def ensure(self):
+        raise NotImplementedError
+
+    def is_empty(self):
+        raise NotImplementedError
+
+    def fingerprint(self):
+        # Hashable; changes whenever the ledger is written; None if it does not exist yet.
+        raise NotImplementedError
+
+    def append(self, row):
+        raise NotImplementedError
+
+    def extend(self, rows):
+        # Backends override this to write a whole batch in one go.
+        return [self.append(row) for row in rows]
+
+    def read(self, username=None, start=None, end=None, month=None):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def clear(self, username):
+        raise NotImplementedError
+
+    def totals(self, username=None, start=None, end=None, month=None):
+        df = self.read(username, start, end, month)
+        with timed("aggregate"):
+            return df.groupby("type")["amount"].sum().to_dict()
+
+    def category_totals(self, t_type, username=None, start=None, end=None, month=None):
+        df = self.read(username, start, end, month)
+        with timed("aggregate"):
+            df = df[df["type"] == t_type.lower()]
+            return df.groupby("category")["amount"].sum().to_dict()
+
+    def rollup(self, granularity="month", username=None):
+        """{period: {type: {category: amount}}} by "day", "week", "month" or "year", oldest first.
+
+        Undated rows are left out. Backends with running totals answer from
+        them; this default aggregates a full read.
+        """
+        df = self.read(username)
+        with timed("aggregate"):
+            return frame_rollup(df, granularity)
+
+    def period_total(self, period, t_type, category, username=None, granularity="month"):
+        """Amount of one type and category in one period ("2025-11" for a month), as rollup has it."""
+        return self.rollup(granularity, username).get(period, {}).get(t_type.lower(), {}).get(category, 0.0)
+
+
+# ---------- CSV BACKEND ----------
+class CsvLedgerStore(LedgerStore):
+    """Today's flat CSV files.
+
+    `columns` and `date_format` are the header and date format for a new
+    file (the Streamlit ledger uses title case, a `Username` column and
+    dd/mm/yyyy), and the format of date strings handed to `append`. An
+    existing file is read and appended to in its own layout, as
+    ledger_schema detects it, so a lowercase ISO ledger with extra columns
+    works wherever a title-case one is expected. Unless `running_totals` is
+    off, whole-month and all-time totals come from a `RunningTotals`
+    sidecar instead of a rescan.
+
+    A `read_only` store never changes anything next to the ledger: old
+    files are not upgraded (rows without an id get positional ones), a
+    stale totals sidecar is bypassed rather than rebuilt, and no lock file
+    is created.
+
+    Several processes may share a file (see ledger_lock): appends hold the
+    lock only while writing, and deletes build the new file unlocked, then
+    retry if another writer got in first.
+    """
+
+    def __init__(self, path, columns=None, date_format=ISO_DATE, running_totals=True, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self.columns = list(columns or CLI_COLUMNS)
+        self.date_format = date_format
+        self._fields = [c.lower() for c in self.columns]
+        self._layout = (None, None)
+        self._upgraded = False
+        self.running = RunningTotals(path) if running_totals else None
+
+    def _has_data(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def ensure(self):
+        if not self._has_data():
+            with open(self.path, "w", newline="") as f:
+                csv.writer(f).writerow(self.columns)
+        self._upgrade()
+
+    def _upgrade(self):
+        # Ledgers written before a column existed (e.g. `id`) are rewritten
+        # once with it filled in; extra columns are kept after ours.
+        if self._upgraded or not self._has_data():
+            return
+        with open(self.path, newline="") as f:
+            lowered = [str(h).lower() for h in next(csv.reader(f), [])]
+        if all(field in lowered for field in self._fields):
+            self._upgraded = True
+            return
+        with locked(self.path):
+            header, rows = self.raw_rows()
+            lowered = [str(h).lower() for h in header]
+            # Another process may have upgraded it while we waited.
+            if not all(field in lowered for field in self._fields):
+                extras = [h for h, low in zip(header, lowered) if low not in self._fields]
+                upgraded = []
+                for raw in rows:
+                    values = dict(zip(lowered, raw))
+                    upgraded.append([values.get(f) or (new_id() if f == "id" else "") for f in self._fields]
+                                    + [values.get(h.lower(), "") for h in extras])
+                self.write_rows(self.columns + extras, upgraded)
+                bump_version(self.path)
+        self._upgraded = True
+
+    @property
+    def layout(self):
+        """The file's own header and date format; the configured ones while it has no rows."""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return Layout(self.columns, self.date_format)
+        seen, layout = self._layout
+        if seen != inode:
+            layout = detect_layout(self.path, self.columns, self.date_format)
+            # Looked at again after a rewrite, and until rows show the date format.
+            self._layout = (inode if layout.detected else None, layout)
+        return layout
+
+    def fingerprint(self):
+        return tuple(file_fingerprint(self.path)) if os.path.exists(self.path) else None
+
+    def is_empty(self):
+        if not self._has_data():
+            return True
+        with open(self.path, newline="") as f:
+            f.readline()
+            return not f.readline().strip()
+
+    def row_values(self, row, layout=None):
+        """A row dict as the list of values written to this file, in its column order and date format."""
+        layout = layout or self.layout
+        date = row.get("date", "")
+        day = parse_day(date, self.date_format)
+        values = dict(row, type=str(row.get("type", "")).lower(),
+                      date=day.strftime(layout.date_format) if day is not None else date)
+        return [values.get(field, "") for field in layout.fields]
+
+    def append(self, row):
+        return self.extend([row])[0]
+
+    def extend(self, rows):
+        rows = [with_id(row) for row in rows]
+        if not rows:
+            return []
+        with timed("write"), locked(self.path):
+            self.ensure()
+            # Under the lock: the lines follow the file's layout as it is now.
+            layout = self.layout
+            lines = [self.row_values(row, layout) for row in rows]
+            fresh = self.running is not None and self.running.is_fresh()
+            if self.running is not None and not fresh and self.is_empty():
+                self.running.reset()
+                fresh = True
+            with open(self.path, "a", newline="") as f:
+                csv.writer(f).writerows(lines)
+            if fresh:
+                self.running.record((parse_day(row.get("date", ""), self.date_format), str(row["type"]),
+                                     row["category"], row["amount"], row.get("username", "")) for row in rows)
+            bump_version(self.path)
+        return [row["id"] for row in rows]
+
+    def _load(self):
+        # A summary asks for totals and category totals back to back, so the
+        # parse is kept (and shared with other stores on the same file, see
+        # ledger_schema.load_frame) until the file's size or mtime changes.
+        if not self.read_only:
+            try:
+                self._upgrade()
+            except OSError:
+                pass  # read-only ledger: rows without an id get positional ones
+        # Shared lock: never parse half of someone else's append.
+        with locked(self.path, shared=True, create=not self.read_only):
+            st = os.stat(self.path)
+            return load_frame(self.path, self.layout, (st.st_size, st.st_mtime_ns))
+
+    def normalize(self, df):
+        """Raw frame in this file's layout -> the canonical schema."""
+        return normalize_frame(df, self.layout)
+
+    def read(self, username=None, start=None, end=None, month=None):
+        if not self._has_data():
+            return empty_frame()
+        return filter_frame(self._load(), username, start, end, month).copy()
+
+    def _running_totals(self, start, end, granularity="month"):
+        if self.running is None or start is not None or end is not None or not self._has_data():
+            return None
+        if not self.running.is_fresh(days=granularity in DAY_GRANULARITIES):
+            if self.read_only:
+                return None  # aggregated from the rows; the sidecar is left as it is
+            with locked(self.path):
+                self.running.rebuild(self._load())
+        return self.running
+
+    def totals(self, username=None, start=None, end=None, month=None):
+        running = self._running_totals(start, end)
+        if running is None:
+            return super().totals(username, start, end, month)
+        with timed("aggregate"):
+            return running.totals(username, month)
+
+    def category_totals(self, t_type, username=None, start=None, end=None, month=None):
+        running = self._running_totals(start, end)
+        if running is None:
+            return super().category_totals(t_type, username, start, end, month)
+        with timed("aggregate"):
+            return running.category_totals(t_type, username, month)
+
+    def rollup(self, granularity="month", username=None):
+        running = self._running_totals(None, None, granularity)
+        if running is None:
+            return super().rollup(granularity, username)
+        with timed("aggregate"):
+            return running.rollup(granularity, username)
+
+    def period_total(self, period, t_type, category, username=None, granularity="month"):
+        running = self._running_totals(None, None, granularity)
+        if running is None:
+            return super().period_total(period, t_type, category, username, granularity)
+        return running.amount(period, t_type, category, username, granularity)
+
+    # Deletes work on the raw rows so untouched lines are written back verbatim.
+    def raw_rows(self):
+        if not self._has_data():
+            return list(self.columns), []
+        with open(self.path, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            # Blank lines are skipped, as pd.read_csv does, so positions match `read`.
+            return header, [r for r in reader if r]
+
+    def write_temp(self, header, rows):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+
+    def write_rows(self, header, rows):
+        # Temp file plus rename: a crash leaves the old ledger or the new
+        # one, never a truncated mix.
+        os.replace(self.write_temp(header, rows), self.path)
+
+    def _rewrite(self, keep):
+        if not self._has_data():
+            return
+        self.ensure()
+
+        def compute():
+            header, rows = self.raw_rows()
+            lowered = [str(h).lower() for h in header]
+            return header, [r for r in rows if keep(dict(zip(lowered, r)))]
+
+        optimistic_rewrite(self.path, compute, lambda result: self.write_rows(*result))
+
+    def delete(self, ids):
+        drop = {str(i) for i in ids}
+        if self._has_data() and drop & set(self._load().index):
+            self._rewrite(lambda row: row.get("id") not in drop)
+
+    def clear(self, username):
+        self._rewrite(lambda row: row.get("username") != username)
+
+
+# ---------- SQLITE BACKEND ----------
+class SqliteLedgerStore(LedgerStore):
+    """SQLite ledger indexed on (username, date) and (type, category).
+
+    Dates are stored as ISO text so range filters use the index. Rows keep
+    the id they were given (a ULID from `with_id` unless the caller set
+    one), as the other backends do, and come back in the order they were
+    inserted.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            username TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (username, date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_type_category ON transactions (type, category);
+    """
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self._ready = False
+
+    def _connect(self):
+        if self.read_only:
+            # The schema is not created or migrated on a read-only open.
+            return sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True)
+        conn = sqlite3.connect(self.path)
+        if not self._ready:
+            conn.executescript(self.SCHEMA)
+            self._ready = True
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        # sqlite3's own context manager commits or rolls back, but never closes.
+        conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ensure(self):
+        self._connect().close()
+
+    def fingerprint(self):
+        return tuple(file_fingerprint(self.path)) if os.path.exists(self.path) else None
+
+    def is_empty(self):
+        if not os.path.exists(self.path):
+            return True
+        with self._connection() as conn:
+            return conn.execute("SELECT 1 FROM transactions LIMIT 1").fetchone() is None
+
+    @staticmethod
+    def _where(username=None, start=None, end=None, month=None):
+        import pandas as pd
+
+        clauses, params = [], []
+        if username is not None:
+            clauses.append("username = ?")
+            params.append(username)
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(pd.Timestamp(start).strftime(ISO_DATE))
+        if end is not None:
+            clauses.append("date < ?")
+            params.append(pd.Timestamp(end).strftime(ISO_DATE))
+        if month is not None:
+            clauses.append("substr(date, 6, 2) = ?")
+            params.append(f"{month:02d}")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def append(self, row):
+        return self.extend([row])[0]
+
+    def extend(self, rows):
+        # One transaction for the batch.
+        rows = [with_id(row) for row in rows]
+        with timed("write"), self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO transactions (id, type, category, amount, date, description, username) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(str(row["id"]), str(row["type"]).lower(), row["category"], float(row["amount"]),
+                  format_date(row.get("date", ""), ISO_DATE),
+                  row.get("description", "") or "", row.get("username", "") or "") for row in rows],
+            )
+        return [row["id"] for row in rows]
+
+    def read(self, username=None, start=None, end=None, month=None):
+        import pandas as pd
+
+        where, params = self._where(username, start, end, month)
+        with timed("load"), self._connection() as conn:
+            df = pd.read_sql_query(
+                f"SELECT id, {', '.join(FIELDS)} FROM transactions{where} ORDER BY rowid",
+                conn, params=params, index_col="id",
+            )
+        with timed("parse"):
+            df.index.name = None
+            df["date"] = pd.to_datetime(df["date"], format=ISO_DATE, errors="coerce")
+        return df
+
+    def delete(self, ids):
+        with self._connection() as conn:
+            conn.executemany("DELETE FROM transactions WHERE id = ?", [(str(i),) for i in ids])
+
+    def clear(self, username):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM transactions WHERE username = ?", (username,))
+
+    def totals(self, username=None, start=None, end=None, month=None):
+        where, params = self._where(username, start, end, month)
+        with timed("aggregate"), self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT type, SUM(amount) FROM transactions{where} GROUP BY type", params
+            ).fetchall()
+        return dict(rows)
+
+    def category_totals(self, t_type, username=None, start=None, end=None, month=None):
+        where, params = self._where(username, start, end, month)
+        where = (where + " AND" if where else " WHERE") + " type = ?"
+        with timed("aggregate"), self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT category, SUM(amount) FROM transactions{where} GROUP BY category",
+                params + [t_type.lower()],
+            ).fetchall()
+        return dict(rows)
+
+
+# ---------- FACTORY ----------
+def open_store(path, backend=None, read_only=False, **csv_options):
+    """Open the ledger at `path`.
+
+    The backend comes from `backend`, else the HK_BACKEND env var, else the
+    path: `.db`/`.parquet` extensions pick SQLite/Parquet, and a directory,
+    or a flat CSV whose partition directory holds partitions (see
+    ledger_partitions.holds_partitions), is partitioned; any other folder of
+    the same name is left alone. Asking for SQLite or Parquet on a `.csv` path uses a
+    `.db`/`.parquet` file next to it, so every front-end can switch without
+    changing its paths. A `read_only` store never upgrades or migrates the
+    ledger and writes no sidecars, for reports over other people's files.
+    """
+    # Imported here because these backends build on this module.
+    from ledger_partitions import PartitionedCsvLedgerStore, holds_partitions, partition_dir_for
+
+    backend = (backend or os.environ.get("HK_BACKEND") or "").lower()
+    if not backend:
+        if path.lower().endswith(SQLITE_EXTENSIONS):
+            backend = "sqlite"
+        elif path.lower().endswith(".parquet"):
+            backend = "parquet"
+        elif os.path.isdir(path) or holds_partitions(partition_dir_for(path)):
+            backend = "partitioned"
+        else:
+            backend = "csv"
+    if backend == "partitioned":
+        if not os.path.isdir(path) and path.lower().endswith(".csv"):
+            path = partition_dir_for(path)
+        return PartitionedCsvLedgerStore(path, read_only=read_only, **csv_options)
+    if backend == "sqlite":
+        if not path.lower().endswith(SQLITE_EXTENSIONS):
+            path = os.path.splitext(path)[0] + ".db"
+        return SqliteLedgerStore(path, read_only=read_only)
+    if backend == "parquet":
+        from ledger_parquet import ParquetLedgerStore
+
+        if not path.lower().endswith(".parquet"):
+            path = os.path.splitext(path)[0] + ".parquet"
+        return ParquetLedgerStore(path, read_only=read_only)
+    if backend == "csv":
+        return CsvLedgerStore(path, read_only=read_only, **csv_options)
+    raise ValueError(f"Unknown ledger backend: {backend!r}")
@@ -0,0 +1,305 @@
+import json
+import os
+from datetime import date as date_cls, datetime
+
+from ledger_lock import locked
+
+GRANULARITIES = ("day", "week", "month", "year")
+# RunningTotals keeps the first two apart from the others, see there.
+DAY_GRANULARITIES, MONTH_GRANULARITIES = GRANULARITIES[:2], GRANULARITIES[2:]
+MONTH_ABBRS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+# Bumped whenever the sidecar layout changes; older sidecars are rebuilt.
+SIDECAR_FORMAT = 3
+# Rows appended to the day/week log before it is folded into its snapshot.
+LOG_LIMIT = 2000
+
+
+def file_fingerprint(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def parse_day(value, date_format):
+    """A date object, or a date string written with `date_format`, as a date; None if unreadable."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date_cls):
+        return value
+    try:
+        return datetime.strptime(str(value), date_format).date()
+    except ValueError:
+        return None
+
+
+def month_key(value, date_format):
+    """`YYYY-MM` for a date object or a date string written with `date_format`."""
+    day = parse_day(value, date_format)
+    return day.strftime("%Y-%m") if day is not None else ""
+
+
+def periods(day):
+    """Labels of the day, ISO week, month and year holding `day`; all "" for None."""
+    if day is None:
+        return ("",) * len(GRANULARITIES)
+    year, week, _ = day.isocalendar()
+    return (day.isoformat(), f"{year}-W{week:02d}", f"{day.year}-{day.month:02d}", str(day.year))
+
+
+# ---------- ROLLUPS ----------
+# A rollup is {period: {type: {category: amount}}} at one granularity,
+# oldest period first, with undated rows left out.
+def frame_rollup(df, granularity):
+    """Rollup aggregated from a canonical ledger frame, for backends without a sidecar."""
+    level = GRANULARITIES.index(granularity)
+    df = df.dropna(subset=["date", "type", "category"])
+    grouped = df.groupby([df["date"].dt.date, "type", "category"])["amount"].sum()
+    result = {}
+    for (day, t_type, category), amount in grouped.items():
+        cell = result.setdefault(periods(day)[level], {}).setdefault(t_type, {})
+        cell[category] = cell.get(category, 0.0) + float(amount)
+    return dict(sorted(result.items()))
+
+
+def merge_rollups(rollups):
+    result = {}
+    for rollup in rollups:
+        for period, types in rollup.items():
+            for t_type, categories in types.items():
+                cell = result.setdefault(period, {}).setdefault(t_type, {})
+                for category, amount in categories.items():
+                    cell[category] = cell.get(category, 0.0) + amount
+    return dict(sorted(result.items()))
+
+
+def series(rollup, t_type, category=None):
+    """{period: amount} of one type (and category) out of a rollup, every period kept."""
+    return {period: (types.get(t_type, {}).get(category, 0.0) if category is not None
+                     else sum(types.get(t_type, {}).values(), 0.0))
+            for period, types in rollup.items()}
+
+
+def year_over_year(month_rollup, t_type, category=None):
+    """{year: [amount for Jan..Dec]} of one type out of a month rollup."""
+    years = {}
+    for period, amount in series(month_rollup, t_type, category).items():
+        years.setdefault(period[:4], [0.0] * 12)[int(period[5:7]) - 1] += amount
+    return years
+
+
+# ---------- RUNNING TOTALS ----------
+class RunningTotals:
+    """Sums per (period, type, category) kept in sidecars next to a ledger.
+
+    Every row is added to its day, ISO week, month and year, so totals and
+    rollups (`rollup`) at any of those granularities are lookups, and
+    multi-year trend charts never re-aggregate rows. Sums are grouped per
+    username so the shared Streamlit ledger can use it too; single-user
+    ledgers keep everything under "".
+
+    Month and year sums are small and live in `.totals.json`, rewritten on
+    each `record`. Day and week sums are some thirty times bigger, so they live
+    in a `.totals.days.json` snapshot, with the rows recorded since it was
+    taken appended to `.totals.days.log`; they are read only when a day or
+    week figure is asked for, and the log is folded into the snapshot every
+    `LOG_LIMIT` rows. `.totals.json` records the ledger's size and mtime
+    after its last update, and is only trusted while they still match, so
+    editing the CSV by hand triggers a rebuild. A stale copy in memory is
+    re-read from disk first, since another process may have appended and
+    kept the sidecars current.
+    Rows with an unreadable date count towards the all-time totals only.
+    """
+
+    def __init__(self, ledger_path):
+        self.ledger_path = ledger_path
+        self.path = ledger_path + ".totals.json"
+        self.days_path = ledger_path + ".totals.days.json"
+        self.log_path = ledger_path + ".totals.days.log"
+        self.fingerprint = None
+        self.sums = {}
+        self._days = None  # {"stamp": snapshot fingerprint, "log": [bytes, rows]}
+        self._days_loaded = False
+        self._unapplied = []  # rows added while the day/week sums were not loaded
+        self._read()
+
+    def _read(self):
+        self.fingerprint, self.sums, self._days = None, {}, None
+        self._days_loaded, self._unapplied = False, []
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("format") != SIDECAR_FORMAT:
+                return  # an older layout: rebuilt on first use
+            self.fingerprint = data["fingerprint"]
+            self.sums = data["sums"]
+            self._days = data["days"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _days_on_disk(self):
+        # The snapshot is the one `.totals.json` was written with, and the log
+        # holds at least the rows it counts (a writer appends before saving).
+        try:
+            return (self._days is not None and file_fingerprint(self.days_path) == self._days["stamp"]
+                    and os.path.getsize(self.log_path) >= self._days["log"][0])
+        except OSError:
+            return False
+
+    def is_fresh(self, days=False):
+        """Whether the sums match the ledger; with `days`, the day/week sums are read in as well."""
+        if not os.path.exists(self.ledger_path):
+            return False
+        current = file_fingerprint(self.ledger_path)
+        if self.fingerprint != current:
+            self._read()
+        fresh = self.fingerprint == current and (self._days_loaded or self._days_on_disk())
+        return fresh and (not days or self.load_days())
+
+    def load_days(self):
+        """Read the day/week sums in, if not yet; False if the sidecars moved on since `.totals.json` was read."""
+        if self._days_loaded:
+            return True
+        with locked(self.ledger_path, shared=True):
+            if not self._days_on_disk():
+                return False
+            with open(self.days_path) as f:
+                snapshot = json.load(f)["sums"]
+            with open(self.log_path, "rb") as f:
+                log = f.read(self._days["log"][0]).decode("utf-8").splitlines()
+        for username, own in snapshot.items():
+            self.sums.setdefault(username, {}).update(own)
+        self._days_loaded = True
+        for line in log:
+            username, day, t_type, category, amount = json.loads(line)
+            self._add_days(date_cls.fromisoformat(day) if day else None, t_type, category, amount, username)
+        for entry in self._unapplied:
+            self._add_days(*entry)
+        self._unapplied = []
+        return True
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def save(self):
+        """Write every sidecar afresh: the day/week snapshot, an empty log and the month/year sums."""
+        if not self.load_days():
+            return
+        try:
+            self._write(self.days_path, {"format": SIDECAR_FORMAT, "sums": {
+                username: {g: own.get(g, {}) for g in DAY_GRANULARITIES} for username, own in self.sums.items()}})
+            open(self.log_path, "w").close()
+            self._days = {"stamp": file_fingerprint(self.days_path), "log": [0, 0]}
+            self._save_months()
+        except OSError:
+            # Read-only data dir: keep the totals in memory for this process.
+            pass
+
+    def _save_months(self):
+        self.fingerprint = file_fingerprint(self.ledger_path)
+        self._write(self.path, {"format": SIDECAR_FORMAT, "fingerprint": self.fingerprint, "days": self._days,
+                                "sums": {username: {g: own.get(g, {}) for g in MONTH_GRANULARITIES}
+                                         for username, own in self.sums.items()}})
+
+    def record(self, entries):
+        """Add (day, type, category, amount, username) `entries` just appended to the ledger, and persist them.
+
+        Call with the ledger's lock held, after `is_fresh` said the sidecars
+        were current before the append.
+        """
+        entries = list(entries)
+        for entry in entries:
+            self.add(*entry)
+        if self._days is None or self._days["log"][1] + len(entries) > LOG_LIMIT:
+            self.save()  # after `reset`, or once the log is long: fold it in
+            return
+        lines = "".join(json.dumps([username or "", day.isoformat() if day is not None else "",
+                                    t_type.lower(), category, float(amount)]) + "\n"
+                        for day, t_type, category, amount, username in entries)
+        try:
+            with open(self.log_path, "ab") as f:
+                # From where .totals.json says the log ends: drops a torn tail.
+                f.truncate(self._days["log"][0])
+                f.write(lines.encode("utf-8"))
+                size = f.tell()
+            self._days = {"stamp": self._days["stamp"], "log": [size, self._days["log"][1] + len(entries)]}
+            self._unapplied = []  # in the log now, which load_days reads
+            self._save_months()
+        except OSError:
+            pass
+
+    def reset(self):
+        self.sums = {}
+        self._days, self._days_loaded, self._unapplied = None, True, []
+
+    def rebuild(self, df):
+        # One add per (user, day, type, category) rather than per row.
+        self.reset()
+        df = df.dropna(subset=["type", "category"])
+        grouped = (
+            df.assign(day=df["date"].dt.date, username=df["username"].fillna(""))
+            .groupby(["username", "day", "type", "category"], dropna=False)["amount"].sum()
+        )
+        for (username, day, t_type, category), amount in grouped.items():
+            self.add(day if isinstance(day, date_cls) else None, t_type, category, amount, username)
+        self.save()
+
+    def add(self, day, t_type, category, amount, username=""):
+        """Count one row dated `day` (a date, or None if it has none), in memory only."""
+        self._add(MONTH_GRANULARITIES, periods(day)[2:], t_type, category, amount, username)
+        if self._days_loaded:
+            self._add_days(day, t_type, category, amount, username)
+        else:
+            self._unapplied.append((day, t_type, category, amount, username))
+
+    def _add_days(self, day, t_type, category, amount, username=""):
+        self._add(DAY_GRANULARITIES, periods(day)[:2], t_type, category, amount, username)
+
+    def _add(self, granularities, labels, t_type, category, amount, username):
+        bucket = self.sums.setdefault(username or "", {})
+        for granularity, period in zip(granularities, labels):
+            sums = bucket.setdefault(granularity, {})
+            key = f"{period}|{t_type.lower()}|{category}"
+            sums[key] = sums.get(key, 0.0) + float(amount)
+
+    def _items(self, username=None, month=None, granularity="month"):
+        if granularity in DAY_GRANULARITIES:
+            self.load_days()
+        buckets = [self.sums.get(username, {})] if username is not None else self.sums.values()
+        for bucket in buckets:
+            for key, amount in bucket.get(granularity, {}).items():
+                period, t_type, category = key.split("|", 2)
+                if month is not None and (not period or int(period[5:7]) != month):
+                    continue
+                yield period, t_type, category, amount
+
+    def amount(self, period, t_type, category, username=None, granularity="month"):
+        """The sum for one (period, type, category) cell: a lookup, however many rows were added."""
+        if granularity in DAY_GRANULARITIES:
+            self.load_days()
+        buckets = [self.sums.get(username, {})] if username is not None else self.sums.values()
+        key = f"{period}|{t_type.lower()}|{category}"
+        return sum(bucket.get(granularity, {}).get(key, 0.0) for bucket in buckets)
+
+    def rollup(self, granularity="month", username=None):
+        result = {}
+        for period, t_type, category, amount in self._items(username, granularity=granularity):
+            if period:
+                cell = result.setdefault(period, {}).setdefault(t_type, {})
+                cell[category] = cell.get(category, 0.0) + amount
+        return dict(sorted(result.items()))
+
+    def totals(self, username=None, month=None):
+        result = {}
+        for _, t_type, _, amount in self._items(username, month):
+            result[t_type] = result.get(t_type, 0.0) + amount
+        return result
+
+    def category_totals(self, t_type, username=None, month=None):
+        result = {}
+        t_type = t_type.lower()
+        for _, row_type, category, amount in self._items(username, month):
+            if row_type == t_type:
+                result[category] = result.get(category, 0.0) + amount
+        return result
@@ -0,0 +1,277 @@
+import atexit
+import json
+import os
+import threading
+
+import pandas as pd
+
+from ledger_lock import bump_version, locked, read_version
+from ledger_metrics import timed
+from ledger_store import FIELDS, LedgerStore, filter_frame, with_id
+from ledger_totals import file_fingerprint
+
+
+# ---------- WRITE-AHEAD LOG ----------
+class WalLedgerStore(LedgerStore):
+    """Write-ahead log in front of a CsvLedgerStore.
+
+    Adds, deletes and user clears are appended to `<ledger>.wal` as JSON
+    lines, so a mutation is O(1) I/O whatever the ledger size. Reads replay
+    the log over the base file. A delete is a tombstone naming the row's
+    id: readers skip tombstoned rows and compaction purges them.
+
+    fsync is group-committed: once `sync_every` records are pending, or
+    after `sync_interval` seconds. A background thread folds the log into
+    the base file once it holds `compact_at` records.
+
+    Compaction moves the log aside to `<ledger>.wal.compacting` and writes
+    the merged ledger to a temp file. It records that file's fingerprint in
+    `<ledger>.wal.checkpoint`, then renames it over the base. On open, a
+    leftover compacting segment is dropped if the base carries the
+    checkpointed fingerprint (already folded in) and replayed otherwise,
+    so a crash at any step loses nothing and applies nothing twice.
+
+    Processes can share a log. Each one reads the records the others
+    appended, from where it last stopped, under the ledger lock before
+    every read and write. Compaction holds that lock throughout and bumps
+    the ledger version. That tells the other processes to reopen the log
+    and reload, so they neither lose the folded records nor count them
+    twice.
+    """
+
+    def __init__(self, base, sync_every=32, sync_interval=0.05, compact_at=1000):
+        self.base = base
+        self.path = base.path
+        self.wal_path = base.path + ".wal"
+        self.frozen_path = self.wal_path + ".compacting"
+        self.checkpoint_path = self.wal_path + ".checkpoint"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_at = compact_at
+
+        self._lock = threading.RLock()
+        self._offset = 0
+        with locked(self.path):
+            self._version = read_version(self.path)
+            self._records = self._recover()
+        self._unsynced = 0
+        self._log = open(self.wal_path, "a")
+
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._background, name="ledger-wal", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # ----- recovery -----
+    @staticmethod
+    def _load_records(path, offset=0):
+        """Records from byte `offset` on, and the offset after the last whole one."""
+        records = []
+        if not os.path.exists(path):
+            return records, 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A torn last line from a crash mid-write was never acknowledged.
+                    break
+                if not line.endswith(b"\n"):
+                    records.pop()
+                    break
+                offset += len(line)
+        return records, offset
+
+    def _recover(self):
+        if os.path.exists(self.base.path + ".tmp"):
+            os.remove(self.base.path + ".tmp")
+        records = []
+        if os.path.exists(self.frozen_path):
+            folded = False
+            if os.path.exists(self.checkpoint_path) and os.path.exists(self.base.path):
+                with open(self.checkpoint_path) as f:
+                    folded = json.load(f)["fingerprint"] == file_fingerprint(self.base.path)
+            if folded:
+                os.remove(self.frozen_path)
+            else:
+                records, _ = self._load_records(self.frozen_path)
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        logged, end = self._load_records(self.wal_path)
+        records += logged
+        if os.path.exists(self.frozen_path):
+            # Put everything back in one log so the next compaction starts clean.
+            self._write_log(self.wal_path, records)
+            os.remove(self.frozen_path)
+        elif os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) > end:
+            # Cut a torn last line off, or the next record would be glued onto it.
+            os.truncate(self.wal_path, end)
+        self._offset = os.path.getsize(self.wal_path) if os.path.exists(self.wal_path) else 0
+        return records
+
+    def _write_checkpoint(self, fingerprint):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fingerprint": fingerprint}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    @staticmethod
+    def _write_log(path, records):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _catch_up(self):
+        # Call with both locks held.
+        version = read_version(self.path)
+        if version != self._version or os.path.exists(self.frozen_path):
+            # The base was rewritten by another process (or one died while
+            # compacting): start over from the files.
+            self._log.close()
+            self._records = self._recover()
+            self._log = open(self.wal_path, "a")
+            self._version = version
+            return
+        records, self._offset = self._load_records(self.wal_path, self._offset)
+        self._records += records
+
+    # ----- logging -----
+    def _log_records(self, records):
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with timed("write"), self._lock, locked(self.path):
+            self._catch_up()
+            self._log.write(lines)
+            self._log.flush()
+            self._offset += len(lines.encode())
+            self._records += records
+            self._unsynced += len(records)
+            if self._unsynced >= self.sync_every:
+                self.sync()
+
+    def sync(self):
+        with self._lock:
+            if self._unsynced:
+                os.fsync(self._log.fileno())
+                self._unsynced = 0
+
+    def _background(self):
+        while not self._stop.wait(self.sync_interval):
+            self.sync()
+            if len(self._records) >= self.compact_at:
+                self.compact()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if not self._log.closed:
+                self.sync()
+                self._log.close()
+
+    # ----- LedgerStore interface -----
+    def ensure(self):
+        self.base.ensure()
+
+    def fingerprint(self):
+        with self._lock, locked(self.path):
+            self._catch_up()
+            return self.base.fingerprint(), self._version, self._offset
+
+    def is_empty(self):
+        return self.read().empty
+
+    def extend(self, rows):
+        rows = [with_id(row) for row in rows]
+        if rows:
+            layout = self.base.layout
+            self._log_records([{"op": "add", "row": self.base.row_values(row, layout)} for row in rows])
+        return [row["id"] for row in rows]
+
+    def append(self, row):
+        return self.extend([row])[0]
+
+    def delete(self, ids):
+        records = [{"op": "delete", "id": str(row_id)} for row_id in ids]
+        if records:
+            self._log_records(records)
+
+    def clear(self, username):
+        self._log_records([{"op": "clear", "username": username}])
+
+    def read(self, username=None, start=None, end=None, month=None):
+        with self._lock, locked(self.path):
+            self._catch_up()
+            df = self.base.read()
+            records = list(self._records)
+        with timed("parse"):
+            df = self._replay_frame(df, records)
+        return filter_frame(df, username, start, end, month)
+
+    # ----- replay -----
+    # Ids are never reused, so tombstones can all be applied at the end; a
+    # clear only covers rows added before it, so it is applied in order.
+    def _replay_frame(self, df, records):
+        pending, tombstones = [], set()
+
+        def flush_adds(df):
+            if not pending:
+                return df
+            added = self.base.normalize(pd.DataFrame(pending, columns=self.base.layout.columns))[FIELDS]
+            pending.clear()
+            return pd.concat([df, added]) if not df.empty else added
+
+        for record in records:
+            if record["op"] == "add":
+                pending.append(record["row"])
+            elif record["op"] == "delete":
+                tombstones.add(record["id"])
+            elif record["op"] == "clear":
+                df = flush_adds(df)
+                df = df[df["username"] != record["username"]]
+        df = flush_adds(df)
+        return df[~df.index.isin(tombstones)] if tombstones else df
+
+    def _replay_rows(self, header, rows, records):
+        fields = [str(c).lower() for c in header]
+        id_col = fields.index("id")
+        user_col = fields.index("username") if "username" in fields else None
+        tombstones = set()
+        for record in records:
+            if record["op"] == "add":
+                rows.append(record["row"])
+            elif record["op"] == "delete":
+                tombstones.add(record["id"])
+            elif record["op"] == "clear" and user_col is not None:
+                rows = [r for r in rows if len(r) <= user_col or r[user_col] != record["username"]]
+        return [r for r in rows if r[id_col] not in tombstones] if tombstones else rows
+
+    # ----- compaction -----
+    def compact(self):
+        """Fold the log into the base file; safe to call from any thread.
+
+        Mutations from this and every other process wait until it is done.
+        """
+        with self._lock, locked(self.path):
+            self._catch_up()
+            if not self._records:
+                return
+            self.base.ensure()
+            self.sync()
+            self._log.close()
+            os.replace(self.wal_path, self.frozen_path)
+            self._log = open(self.wal_path, "a")
+
+            header, rows = self.base.raw_rows()
+            rows = self._replay_rows(header, rows, self._records)
+            tmp_path = self.base.write_temp(header, rows)
+            self._write_checkpoint(file_fingerprint(tmp_path))
+            os.replace(tmp_path, self.base.path)
+            self._version = bump_version(self.path)
+            self._records, self._offset = [], 0
+            os.remove(self.frozen_path)
+            os.remove(self.checkpoint_path)
@@ -0,0 +1,237 @@
+import csv
+import io
+import os
+import threading
+
+from ledger_lock import locked
+from ledger_metrics import operation, phase, timed
+from ledger_store import CsvLedgerStore
+from ledger_totals import DAY_GRANULARITIES, RunningTotals, file_fingerprint, parse_day
+
+# Bytes kept from just before the read offset; if they change, the file was
+# rewritten in place rather than appended to.
+TAIL_CHECK = 64
+
+
+# ---------- CSV TAIL ----------
+def csv_records(f, fields, offset=0):
+    """(byte offset, row dict) for each record read from binary file `f`, which is at `offset`.
+
+    Records can span lines (a quoted newline in a description); each one's
+    offset is where its first line starts, so seeking there reads it again.
+    Stops at a last line without its newline.
+    """
+    consumed = offset
+
+    def lines():
+        nonlocal consumed
+        for line in iter(f.readline, b""):
+            if not line.endswith(b"\n"):
+                return
+            consumed += len(line)
+            yield line.decode("utf-8")
+
+    start = offset
+    for raw in csv.reader(lines()):
+        if raw:
+            yield start, dict(zip(fields, raw))
+        start = consumed
+
+
+class CsvTail:
+    """Where a CSV ledger was last read up to, so only rows appended since are parsed.
+
+    The bytes just before the offset are kept too: if they changed, or the
+    inode did, or the file got shorter, it was rewritten rather than
+    appended to, and `read` returns None so the caller can rebuild and
+    `reset`.
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.inode = state.get("inode")
+        self.offset = state.get("offset", 0)
+        self.tail = bytes.fromhex(state.get("tail", ""))
+        self.fields = state.get("fields", [])
+
+    def state(self):
+        """JSON-friendly copy, for keeping the position in a sidecar."""
+        return {"inode": self.inode, "offset": self.offset, "tail": self.tail.hex(), "fields": self.fields}
+
+    def read(self, path, st=None, offsets=False):
+        """Row dicts (lowercase keys) appended since the last call; None if the file was rewritten.
+
+        With `offsets`, (byte offset, row dict) pairs instead.
+        """
+        st = st or os.stat(path)
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            return None
+        with open(path, "rb") as f:
+            f.seek(self.offset - len(self.tail))
+            data = f.read()
+        if not data.startswith(self.tail):
+            return None
+        data = data[len(self.tail):]
+        # Only whole lines; a torn one is picked up once it is finished.
+        data = data[: data.rfind(b"\n") + 1]
+        if offsets:
+            rows = list(csv_records(io.BytesIO(data), self.fields, self.offset))
+        else:
+            rows = [dict(zip(self.fields, raw)) for raw in csv.reader(io.StringIO(data.decode("utf-8"))) if raw]
+        self.offset += len(data)
+        self.tail = (self.tail + data)[-TAIL_CHECK:]
+        return rows
+
+    def reset(self, path):
+        """Start from the end of the file as it is now."""
+        with open(path, "rb") as f:
+            header = f.readline()
+            self.inode = os.fstat(f.fileno()).st_ino
+            f.seek(0, os.SEEK_END)
+            self.offset = f.tell()
+            f.seek(max(0, self.offset - TAIL_CHECK))
+            self.tail = f.read()
+        self.fields = [h.strip().lower() for h in next(csv.reader([header.decode("utf-8")]), [])]
+
+
+# ---------- LEDGER WATCHER ----------
+class LedgerWatcher:
+    """Keeps a ledger's totals current while other writers append to it.
+
+    A background thread polls the file's size and mtime every `interval`
+    seconds (inotify is not in the stdlib, and polling works everywhere).
+    For a CSV ledger, the rows appended since the last poll are read from
+    the saved byte offset and added to in-memory RunningTotals, so a new
+    row costs its own size. A rewrite (delete, clear, compaction) replaces
+    the file and triggers one rebuild, from the sidecar when it is current.
+    Other backends are re-queried when their fingerprint changes.
+
+    `on_change` is called from the watcher thread after the totals moved.
+    """
+
+    def __init__(self, store, on_change=None, interval=0.5):
+        self.store = store
+        self.on_change = on_change
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._running = RunningTotals(store.path) if isinstance(store, CsvLedgerStore) else None
+        self._stamp = None
+        self._tail = CsvTail()
+        with self._lock:
+            self._catch_up()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="ledger-watch", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except OSError:
+                pass  # mid-rename or briefly unreadable: try again next tick
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        """Catch up with the ledger now; True if the totals changed."""
+        with self._lock, operation("watch", os.path.basename(self.store.path)):
+            changed = self._catch_up()
+        if changed and self.on_change is not None:
+            self.on_change()
+        return changed
+
+    # ----- catching up -----
+    def _catch_up(self):
+        if self._running is None:
+            stamp = self.store.fingerprint()
+            changed, self._stamp = stamp != self._stamp, stamp
+            return changed
+
+        path = self.store.path
+        if not os.path.exists(path):
+            changed = self._stamp is not None
+            self._running.reset()
+            self._stamp, self._tail = None, CsvTail()
+            return changed
+        # Shared lock: writers finish their rows before we look.
+        with locked(path, shared=True):
+            st = os.stat(path)
+            stamp = (st.st_size, st.st_mtime_ns)
+            if stamp == self._stamp:
+                return False
+            with timed("load"):
+                rows = self._tail.read(path, st)
+            if rows is None:
+                self._rebuild()
+            else:
+                with timed("aggregate"):
+                    for values in rows:
+                        self._add(values)
+            self._stamp = stamp
+        return True
+
+    def _add(self, values):
+        # Skipped as RunningTotals.rebuild skips them, so a row counts the
+        # same whether it arrived through the tail or a rebuild.
+        if not values.get("type", "").strip() or not values.get("category", "").strip():
+            return
+        try:
+            amount = float(values.get("amount", ""))
+        except ValueError:
+            return
+        self._running.add(parse_day(values.get("date", ""), self.store.layout.date_format),
+                          values.get("type", ""), values.get("category", ""), amount,
+                          values.get("username", ""))
+
+    @phase("aggregate")
+    def _rebuild(self):
+        # The sidecars are current whenever the last writer kept them so; only
+        # otherwise is the whole file parsed.
+        if not self._running.is_fresh(days=True):
+            self._running.rebuild(self.store.read())
+        self._tail.reset(self.store.path)
+
+    def _load_days(self, granularity):
+        # Read in on the first day or week query; if a writer has folded the
+        # day/week log since, the sidecars are caught up with instead.
+        if granularity in DAY_GRANULARITIES and not self._running.load_days():
+            with locked(self.store.path, shared=True):
+                self._rebuild()
+                self._stamp = tuple(file_fingerprint(self.store.path))
+
+    # ----- queries -----
+    def fingerprint(self):
+        """What the totals below reflect; moves once a change has been folded in."""
+        with self._lock:
+            return self._stamp
+
+    def is_empty(self):
+        return self.store.is_empty()
+
+    def totals(self, username=None, month=None):
+        with self._lock:
+            if self._running is None:
+                return self.store.totals(username, month=month)
+            return self._running.totals(username, month)
+
+    def category_totals(self, t_type, username=None, month=None):
+        with self._lock:
+            if self._running is None:
+                return self.store.category_totals(t_type, username, month=month)
+            return self._running.category_totals(t_type, username, month)
+
+    def rollup(self, granularity="month", username=None):
+        with self._lock:
+            if self._running is None:
+                return self.store.rollup(granularity, username)
+            self._load_days(granularity)
+            return self._running.rollup(granularity, username)
+
+    def period_total(self, period, t_type, category, username=None, granularity="month"):
+        with self._lock:
+            if self._running is None:
+                return self.store.period_total(period, t_type, category, username, granularity)
+            self._load_days(granularity)
+            return self._running.amount(period, t_type, category, username, granularity)
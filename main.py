@@ -1,8 +1,16 @@
+import argparse
 import csv
+import json
 import os
-import pandas as pd
+import sys
 from datetime import datetime
 
+from ledger_budgets import CATEGORIES, BudgetMonitor, Budgets
+from ledger_metrics import enable, is_enabled, last_breakdown, operation, timed
+from ledger_search import LedgerSearch
+from ledger_store import open_store
+from ledger_totals import GRANULARITIES, MONTH_ABBRS, series, year_over_year
+
 # ✅ Always use absolute paths based on this file’s location
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -11,11 +19,13 @@ FILE_PATH = os.path.join(DATA_DIR, "transactions.csv")
 # ✅ Ensure the data folder exists
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# ✅ Create CSV file if it doesn’t exist
-if not os.path.exists(FILE_PATH):
-    with open(FILE_PATH, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["type", "category", "amount", "date", "description"])
+# ✅ CSV by default, SQLite with HK_BACKEND=sqlite
+store = open_store(FILE_PATH)
+# ✅ Monthly limits per category, kept next to the ledger
+budgets = Budgets(FILE_PATH)
+
+TYPES = ("income", "expense")
+BATCH_SIZE = 5000
 
 
 def add_transaction():
@@ -30,11 +40,11 @@ def add_transaction():
             return
         elif t_choice == "1":
             t_type = "income"
-            categories = ["Salary", "Other"]
+            categories = CATEGORIES[t_type]
             break
         elif t_choice == "2":
             t_type = "expense"
-            categories = ["Food", "Rent", "Bills", "Misc"]
+            categories = CATEGORIES[t_type]
             break
         else:
             print("⚠️ Invalid choice! Please try again.")
@@ -63,25 +73,52 @@ def add_transaction():
     date = input("Enter date (YYYY-MM-DD) or press Enter for today: ").strip() or datetime.today().strftime('%Y-%m-%d')
     description = input("Enter description: ")
 
-    with open(FILE_PATH, "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([t_type, category, amount, date, description])
+    # Profiled from here: the prompts above would time the user's typing.
+    with profiled("add"):
+        row = {"type": t_type, "category": category, "amount": amount, "date": date, "description": description}
+        # Checked from the running month totals, before the row is written.
+        alert = BudgetMonitor(budgets, store).add(row)
+        store.append(row)
 
     print(f"✅ Transaction added successfully under category: {category}")
+    if alert is not None:
+        print(alert)
 
 
-def view_summary():
-    if not os.path.exists(FILE_PATH) or os.path.getsize(FILE_PATH) == 0:
-        print("⚠️ No data found!")
-        return
+def manage_budgets():
+    month = datetime.today().strftime("%Y-%m")
+    categories = CATEGORIES["expense"]
+    while True:
+        print(f"\n=== 🎯 Budgets for {month} ===")
+        limits = budgets.limits()
+        for i, category in enumerate(categories, start=1):
+            spent = store.period_total(month, "expense", category)
+            limit = limits.get(category)
+            status = f"₹{spent:,.2f} of ₹{limit:,.2f}" if limit else f"₹{spent:,.2f} (no budget)"
+            print(f"{i}. {category:<15}{status}")
+        print("0. 🔙 Back")
 
-    df = pd.read_csv(FILE_PATH)
-    if df.empty:
+        c_choice = input("Enter category number to set its budget: ").strip()
+        if c_choice == "0":
+            return
+        try:
+            category = categories[int(c_choice) - 1]
+            amount = float(input(f"Monthly budget for {category} (0 to remove): ") or 0)
+        except (ValueError, IndexError):
+            print("⚠️ Invalid choice! Please try again.")
+            continue
+        budgets.set_limits({category: amount})
+        print(f"✅ Budget for {category} {'set' if amount else 'removed'}")
+
+
+def view_summary():
+    totals = store.totals()
+    if not totals:
         print("⚠️ No transactions to show!")
         return
 
-    total_income = df[df["type"] == "income"]["amount"].sum()
-    total_expense = df[df["type"] == "expense"]["amount"].sum()
+    total_income = totals.get("income", 0.0)
+    total_expense = totals.get("expense", 0.0)
     balance = total_income - total_expense
 
     print("\n=== 💼 Summary ===")
@@ -91,27 +128,262 @@ def view_summary():
 
     if total_expense > 0:
         print("Expense by Category:")
-        print(df[df["type"] == "expense"].groupby("category")["amount"].sum())
+        for category, amount in sorted(store.category_totals("expense").items()):
+            print(f"{category:<15}{amount:.2f}")
 
 
-def main():
+# ---------- BATCH COMMANDS ----------
+# Every command prints one JSON document on stdout, for cron jobs and scripts.
+def parse_row(raw):
+    """A transaction from a script (dict of strings or JSON values) -> ledger row."""
+    t_type = str(raw.get("type") or "").strip().lower()
+    if t_type not in TYPES:
+        raise ValueError(f"type must be income or expense, not {raw.get('type')!r}")
+    category = str(raw.get("category") or "").strip()
+    if not category:
+        raise ValueError("category is required")
+    try:
+        amount = float(raw.get("amount"))
+    except (TypeError, ValueError):
+        raise ValueError(f"amount must be a number, not {raw.get('amount')!r}") from None
+    date = str(raw.get("date") or "").strip() or datetime.today().strftime('%Y-%m-%d')
+    datetime.strptime(date, "%Y-%m-%d")
+    return {"type": t_type, "category": category, "amount": amount,
+            "date": date, "description": str(raw.get("description") or "")}
+
+
+def read_rows(stream, fmt):
+    # JSON lines are decoded by the caller, so one bad line is reported
+    # like any other bad row instead of ending the stream.
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+def decode_row(raw):
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if not isinstance(raw, dict):
+        raise ValueError("each row must be a JSON object")
+    return parse_row(raw)
+
+
+def summary_data():
+    totals = store.totals()
+    income, expense = totals.get("income", 0.0), totals.get("expense", 0.0)
+    return {"income": income, "expense": expense, "balance": income - expense,
+            "expense_by_category": dict(sorted(store.category_totals("expense").items()))}
+
+
+def cmd_add(args):
+    row = parse_row(vars(args))
+    alert = BudgetMonitor(budgets, store).add(row)
+    return {"id": store.append(row), **row, "alerts": [alert.to_dict()] if alert is not None else []}
+
+
+def cmd_add_many(args):
+    """Rows from stdin, appended `BATCH_SIZE` at a time; bad rows are reported, not fatal."""
+    ids, errors, batch, alerts = [], [], [], []
+    monitor = BudgetMonitor(budgets, store)
+    for number, raw in enumerate(read_rows(sys.stdin, args.format), start=1):
+        try:
+            batch.append(decode_row(raw))
+        except ValueError as exc:
+            errors.append({"row": number, "error": str(exc)})
+            continue
+        alert = monitor.add(batch[-1])
+        if alert is not None:
+            alerts.append({"row": number, **alert.to_dict()})
+        if len(batch) >= BATCH_SIZE:
+            ids += store.extend(batch)
+            batch = []
+    ids += store.extend(batch)
+    return {"added": len(ids), "ids": ids, "errors": errors, "alerts": alerts}
+
+
+def cmd_summary(args):
+    return summary_data()
+
+
+def cmd_report(args):
+    try:
+        period = datetime.strptime(args.month, "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        raise ValueError(f"month must look like 2025-11, not {args.month!r}") from None
+    # A whole month is one cell of the month rollup, which CSV ledgers keep
+    # in their totals sidecar: no rows are parsed.
+    month = store.rollup("month").get(period, {})
+    income, expense = (sum(month.get(t_type, {}).values(), 0.0) for t_type in TYPES)
+    return {"month": args.month, "income": income, "expense": expense, "balance": income - expense,
+            "expense_by_category": dict(sorted(month.get("expense", {}).items()))}
+
+
+def cmd_trend(args):
+    # Straight from the rollups kept next to the ledger; rows are not re-read.
+    rollup = store.rollup(args.by)
+    types = [args.type] if args.type else TYPES
+    by_type = {t_type: series(rollup, t_type, args.category) for t_type in types}
+    return {"by": args.by, "category": args.category,
+            "periods": {period: {t_type: by_type[t_type][period] for t_type in types} for period in rollup}}
+
+
+def cmd_yoy(args):
+    years = year_over_year(store.rollup("month"), args.type, args.category)
+    return {"type": args.type, "category": args.category,
+            "years": {year: dict(zip(MONTH_ABBRS, amounts)) for year, amounts in years.items()},
+            "totals": {year: sum(amounts) for year, amounts in years.items()}}
+
+
+def cmd_search(args):
+    # The index sidecar is caught up with rows appended since the last
+    # search; only a rewritten ledger is read in full.
+    search = LedgerSearch(store)
+    search.refresh()
+    query = " ".join(args.query)
+    rows = search.search(query, category=args.category, t_type=args.type, limit=args.limit)
+    for row in rows:
+        row["date"] = row["date"].isoformat() if row["date"] else None
+    return {"query": query, "count": len(rows), "rows": rows}
+
+
+def cmd_budget(args):
+    month = args.month or datetime.today().strftime("%Y-%m")
+    try:
+        datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise ValueError(f"month must look like 2025-11, not {month!r}") from None
+    changes = {category: None for category in args.remove or ()}
+    for category, amount in args.set or ():
+        try:
+            changes[category] = float(amount)
+        except ValueError:
+            raise ValueError(f"budget must be a number, not {amount!r}") from None
+    if changes:
+        budgets.set_limits(changes)
+    result = {}
+    for category, limit in sorted(budgets.limits().items()):
+        # One lookup per category in the running month totals.
+        spent = store.period_total(month, "expense", category)
+        result[category] = {"limit": limit, "spent": spent, "left": limit - spent}
+    return {"month": month, "budgets": result}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Budget tracker. Run without a command for the menu.")
+    parser.add_argument("--ledger", default=FILE_PATH, help="ledger to use (default: data/transactions.csv)")
+    parser.add_argument("--profile", action="store_true", help="time each phase; the breakdown goes to stderr")
+    parser.add_argument("--profile-out", metavar="FILE", help="with --profile, write the histograms to FILE "
+                                                              "(.prom for Prometheus text, JSON otherwise)")
+    commands = parser.add_subparsers(dest="command")
+
+    add = commands.add_parser("add", help="add one transaction")
+    add.add_argument("--type", required=True, choices=TYPES)
+    add.add_argument("--category", required=True)
+    add.add_argument("--amount", required=True)
+    add.add_argument("--date", help="YYYY-MM-DD (default: today)")
+    add.add_argument("--description", default="")
+    add.set_defaults(handler=cmd_add)
+
+    add_many = commands.add_parser("add-many", help="add transactions read from stdin")
+    add_many.add_argument("--format", choices=("jsonl", "csv"), default="jsonl",
+                          help="JSON Lines objects or a CSV with a type,category,amount,date,description header")
+    add_many.set_defaults(handler=cmd_add_many)
+
+    summary = commands.add_parser("summary", help="all-time totals")
+    summary.set_defaults(handler=cmd_summary)
+
+    report = commands.add_parser("report", help="totals for one month")
+    report.add_argument("--month", required=True, help="YYYY-MM")
+    report.set_defaults(handler=cmd_report)
+
+    trend = commands.add_parser("trend", help="totals per day, week, month or year")
+    trend.add_argument("--by", choices=GRANULARITIES, default="month")
+    trend.add_argument("--type", choices=TYPES, help="only this type (default: both)")
+    trend.add_argument("--category", help="only this category")
+    trend.set_defaults(handler=cmd_trend)
+
+    yoy = commands.add_parser("yoy", help="month-by-month totals of each year, side by side")
+    yoy.add_argument("--type", choices=TYPES, default="expense")
+    yoy.add_argument("--category", help="only this category")
+    yoy.set_defaults(handler=cmd_yoy)
+
+    search = commands.add_parser("search", help="find transactions by description words")
+    search.add_argument("query", nargs="+",
+                        help='words to match as prefixes, plus e.g. "last 6 months", "this year", "category:Food"')
+    search.add_argument("--category")
+    search.add_argument("--type", choices=TYPES)
+    search.add_argument("--limit", type=int, default=50, help="most rows to print, newest first (default: 50)")
+    search.set_defaults(handler=cmd_search)
+
+    budget = commands.add_parser("budget", help="set monthly expense budgets and see what is left of them")
+    budget.add_argument("--set", nargs=2, action="append", metavar=("CATEGORY", "AMOUNT"),
+                        help="monthly budget for a category (repeatable)")
+    budget.add_argument("--remove", action="append", metavar="CATEGORY", help="drop a category's budget")
+    budget.add_argument("--month", help="YYYY-MM to report on (default: this month)")
+    budget.set_defaults(handler=cmd_budget)
+    return parser
+
+
+def menu():
     while True:
         print("\n=== 💰 Budget Tracker ===")
         print("1. Add Transaction")
         print("2. View Summary")
-        print("3. Exit")
+        print("3. Budgets")
+        print("4. Exit")
 
         choice = input("Enter your choice: ").strip()
 
         if choice == "1":
             add_transaction()
         elif choice == "2":
-            view_summary()
+            with profiled("summary"):
+                view_summary()
         elif choice == "3":
+            manage_budgets()
+        elif choice == "4":
             print("👋 Exiting Budget Tracker. Goodbye!")
             break
         else:
-            print("⚠️ Invalid choice! Please enter 1, 2, or 3.")
+            print("⚠️ Invalid choice! Please enter 1, 2, 3, or 4.")
+
+
+class profiled(operation):
+    """An operation on the open ledger; its breakdown goes to stderr when profiling."""
+
+    def __init__(self, name):
+        super().__init__(name, os.path.basename(store.path))
+
+    def __exit__(self, *exc):
+        super().__exit__(*exc)
+        if is_enabled() and self.phases:
+            print(last_breakdown(self.name), file=sys.stderr)
+        return False
+
+
+def main(argv=None):
+    global store, budgets
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.profile or args.profile_out:
+        enable(args.profile_out)
+    if args.ledger != FILE_PATH:
+        store = open_store(args.ledger)
+        budgets = Budgets(args.ledger)
+    if args.command is None:
+        menu()
+        return
+    with profiled(args.command):
+        try:
+            result = args.handler(args)
+        except ValueError as exc:
+            print(json.dumps({"error": str(exc)}))
+            sys.exit(1)
+        with timed("render"):
+            print(json.dumps(result))
 
 
 if __name__ == "__main__":
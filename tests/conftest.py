@@ -0,0 +1,29 @@
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+# The ledger modules live at the top of the repo, next to the apps.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger_budgets import CATEGORIES  # noqa: E402
+
+
+def make_rows(count, seed=7):
+    """Rows across two users, two years and both types, dated with date objects as the Streamlit app saves them."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        t_type = rng.choice(["income", "expense"])
+        rows.append({"type": t_type, "category": rng.choice(CATEGORIES[t_type]),
+                     "amount": round(rng.uniform(1, 5000), 2),
+                     "date": date(2024, 1, 1) + timedelta(days=rng.randrange(730)),
+                     "description": f"row {rng.randrange(1000)}", "username": rng.choice(["asha", "ravi"])})
+    return rows
+
+
+@pytest.fixture
+def rows():
+    return make_rows(300)
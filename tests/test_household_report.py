@@ -0,0 +1,27 @@
+import csv
+import os
+
+import pytest
+
+from household_report import find_ledgers, member_sums
+from ledger_store import CsvLedgerStore
+from ledger_totals import frame_rollup
+
+
+def test_report_leaves_member_ledgers_alone(tmp_path):
+    # A ledger from before transactions had ids, as an old install left it.
+    path = tmp_path / "asha_transactions.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["type", "category", "amount", "date", "description"])
+        writer.writerow(["expense", "Food", "120.5", "2025-01-03", "thali"])
+        writer.writerow(["income", "Salary", "50000", "2025-02-01", ""])
+    before = path.read_bytes()
+
+    assert find_ledgers(str(tmp_path)) == {"asha": str(path)}
+    sums = member_sums(str(path))
+    assert sums == pytest.approx({("2025-01", "expense", "Food"): 120.5, ("2025-02", "income", "Salary"): 50000.0})
+    assert os.listdir(tmp_path) == ["asha_transactions.csv"]
+    assert path.read_bytes() == before
+    df = CsvLedgerStore(str(path), read_only=True).read()
+    assert len(frame_rollup(df, "month")) == 2
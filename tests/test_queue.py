@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from ledger_queue import WriteBehindLedgerStore
+from ledger_store import CsvLedgerStore
+
+from test_stores import CSV_OPTIONS
+
+
+class FailingStore(CsvLedgerStore):
+    """Raises `failure` from extend while it is set."""
+
+    failure = None
+
+    def extend(self, rows):
+        if self.failure is not None:
+            raise self.failure
+        return super().extend(rows)
+
+
+@pytest.fixture
+def base(tmp_path):
+    return FailingStore(str(tmp_path / "ledger.csv"), **CSV_OPTIONS)
+
+
+def test_dropped_rows_are_reported(base, rows):
+    queue = WriteBehindLedgerStore(base, linger=0)
+    kept = queue.append(rows[0])
+    assert queue.flush(timeout=5)
+
+    base.failure = ValueError("bad row")
+    dropped = queue.extend(rows[1:3])
+    assert not queue.flush(timeout=5)
+    assert set(queue.failed) == set(dropped)
+    assert isinstance(queue.failed[dropped[0]], ValueError)
+
+    base.failure = None
+    later = queue.append(rows[3])
+    assert queue.flush(timeout=5)
+    assert sorted(queue.read().index) == sorted([kept, later])
+    queue.close()
+
+
+def test_io_errors_are_retried(base, rows):
+    queue = WriteBehindLedgerStore(base, linger=0, retry_interval=0.05)
+    base.failure = OSError("disk full")
+    ids = queue.extend(rows[:3])
+    assert not queue.flush(timeout=1)
+    assert queue.pending() == 3 and not queue.failed
+    assert isinstance(queue.error, OSError)
+
+    base.failure = None
+    # flush returns early while writes are failing; the next retry writes them.
+    deadline = time.monotonic() + 5
+    while not queue.flush(timeout=1) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert queue.pending() == 0 and not queue.failed
+    assert sorted(queue.read().index) == sorted(ids)
+    assert queue.close(timeout=5)
@@ -0,0 +1,98 @@
+import pytest
+
+from ledger_partitions import PartitionedCsvLedgerStore
+from ledger_queue import WriteBehindLedgerStore
+from ledger_shards import ShardedLedgerStore
+from ledger_store import CsvLedgerStore, SqliteLedgerStore
+from ledger_totals import GRANULARITIES, frame_rollup
+from ledger_wal import WalLedgerStore
+
+
+def parquet_store(tmp_path):
+    pytest.importorskip("pyarrow")
+    from ledger_parquet import ParquetLedgerStore
+
+    return ParquetLedgerStore(str(tmp_path / "ledger.parquet"))
+
+
+# The Streamlit app's layout: one file holds several users' rows.
+CSV_OPTIONS = {"columns": ["Type", "Category", "Amount", "Date", "Description", "Username", "Id"],
+               "date_format": "%d/%m/%Y"}
+
+
+def csv_store(tmp_path):
+    return CsvLedgerStore(str(tmp_path / "ledger.csv"), **CSV_OPTIONS)
+
+
+BACKENDS = {
+    "csv": csv_store,
+    "sqlite": lambda tmp_path: SqliteLedgerStore(str(tmp_path / "ledger.db")),
+    "partitioned": lambda tmp_path: PartitionedCsvLedgerStore(str(tmp_path / "ledger"), **CSV_OPTIONS),
+    "parquet": parquet_store,
+    "wal": lambda tmp_path: WalLedgerStore(csv_store(tmp_path)),
+    "sharded": lambda tmp_path: ShardedLedgerStore(str(tmp_path / "shards"), **CSV_OPTIONS),
+    "write-behind": lambda tmp_path: WriteBehindLedgerStore(csv_store(tmp_path)),
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def store(request, tmp_path):
+    store = BACKENDS[request.param](tmp_path)
+    store.ensure()
+    yield store
+    if hasattr(store, "close"):
+        store.close()
+
+
+def rounded(rollup):
+    return {period: {t: {c: round(a, 2) for c, a in cats.items()} for t, cats in types.items()}
+            for period, types in rollup.items()}
+
+
+def assert_consistent(store):
+    """Every summary the store answers agrees with aggregating its rows."""
+    df = store.read()
+    for granularity in GRANULARITIES:
+        expected = rounded(frame_rollup(df, granularity))
+        assert rounded(store.rollup(granularity)) == expected
+        assert rounded(store.rollup(granularity, "asha")) == rounded(frame_rollup(df[df["username"] == "asha"],
+                                                                                  granularity))
+        period = next(iter(expected))
+        t_type = next(iter(expected[period]))
+        category = next(iter(expected[period][t_type]))
+        assert store.period_total(period, t_type, category, granularity=granularity) == \
+            pytest.approx(expected[period][t_type][category])
+    totals = df.groupby("type")["amount"].sum().to_dict()
+    assert store.totals() == pytest.approx(totals)
+    month = df[df["date"].dt.month == 3]
+    assert store.category_totals("expense", username="ravi", month=3) == pytest.approx(
+        month[(month["type"] == "expense") & (month["username"] == "ravi")].groupby("category")["amount"]
+        .sum().to_dict())
+
+
+def test_append_and_extend_keep_every_row(store, rows):
+    ids = [store.append(rows[0])] + store.extend(rows[1:])
+    df = store.read()
+    assert sorted(df.index) == sorted(ids)
+    assert df["amount"].sum() == pytest.approx(sum(row["amount"] for row in rows))
+    assert_consistent(store)
+
+
+def test_totals_follow_deletes_and_appends(store, rows):
+    ids = store.extend(rows[:200])
+    store.rollup("day")  # running totals, where the backend keeps them, now exist
+    store.delete(ids[::3])
+    store.extend(rows[200:])
+    df = store.read()
+    assert len(df) == len(rows) - len(ids[::3])
+    assert not set(ids[::3]) & set(df.index)
+    assert_consistent(store)
+
+
+def test_clear_drops_only_that_user(store, rows):
+    store.extend(rows)
+    store.clear("asha")
+    df = store.read()
+    assert set(df["username"]) == {"ravi"}
+    assert store.rollup("month", "asha") == {}
+    assert_consistent(store)
@@ -0,0 +1,50 @@
+import csv
+
+import pytest
+
+from ledger_store import CsvLedgerStore
+from ledger_totals import GRANULARITIES, RunningTotals, frame_rollup
+
+from test_stores import CSV_OPTIONS, rounded
+
+
+def hand_edit(path, edit):
+    with open(path, newline="") as f:
+        lines = list(csv.reader(f))
+    lines = [lines[0]] + edit(lines[1:])
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(lines)
+
+
+def test_sidecar_is_rebuilt_after_a_hand_edit(tmp_path, rows):
+    path = str(tmp_path / "ledger.csv")
+    store = CsvLedgerStore(path, **CSV_OPTIONS)
+    store.extend(rows)
+    store.rollup("day")
+    assert RunningTotals(path).is_fresh(days=True)
+
+    # Someone fixes an amount and drops a line in a spreadsheet.
+    amount = CSV_OPTIONS["columns"].index("Amount")
+
+    def edit(lines):
+        lines[0][amount] = "12345.67"
+        return lines[:10] + lines[11:]
+
+    hand_edit(path, edit)
+    assert not RunningTotals(path).is_fresh()
+
+    store = CsvLedgerStore(path, **CSV_OPTIONS)
+    df = store.read()
+    assert len(df) == len(rows) - 1
+    for granularity in GRANULARITIES:
+        assert rounded(store.rollup(granularity)) == rounded(frame_rollup(df, granularity))
+    assert store.totals() == pytest.approx(df.groupby("type")["amount"].sum().to_dict())
+    assert RunningTotals(path).is_fresh(days=True)
+
+
+def test_undated_rows_count_only_all_time(tmp_path, rows):
+    store = CsvLedgerStore(str(tmp_path / "ledger.csv"), **CSV_OPTIONS)
+    store.extend(rows[:20] + [dict(rows[20], date="someday", amount=100.0)])
+    df = store.read()
+    assert store.totals() == pytest.approx(df.groupby("type")["amount"].sum().to_dict())
+    assert rounded(store.rollup("month")) == rounded(frame_rollup(df, "month"))
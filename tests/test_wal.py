@@ -0,0 +1,38 @@
+from ledger_store import CsvLedgerStore
+from ledger_wal import WalLedgerStore
+
+from test_stores import CSV_OPTIONS
+
+
+def open_wal(tmp_path):
+    # No background compaction: the rows stay in the log.
+    return WalLedgerStore(CsvLedgerStore(str(tmp_path / "ledger.csv"), **CSV_OPTIONS), compact_at=10 ** 9)
+
+
+def test_replay_drops_a_torn_tail(tmp_path, rows):
+    wal = open_wal(tmp_path)
+    ids = wal.extend(rows[:50])
+    wal.delete(ids[:5])
+    wal.close()
+    with open(wal.wal_path, "a") as f:
+        f.write('{"op": "add", "row": ["expense", "Fo')  # the process died mid-write
+
+    wal = open_wal(tmp_path)
+    assert sorted(wal.read().index) == sorted(ids[5:])
+    # The torn line is cut off, so the next record starts on a line of its own.
+    new_id = wal.append(rows[50])
+    wal.close()
+    wal = open_wal(tmp_path)
+    assert sorted(wal.read().index) == sorted(ids[5:] + [new_id])
+    wal.close()
+
+
+def test_compaction_keeps_every_row(tmp_path, rows):
+    wal = open_wal(tmp_path)
+    ids = wal.extend(rows)
+    wal.delete(ids[::2])
+    before = wal.read().sort_index()
+    wal.compact()
+    assert wal.read().sort_index().equals(before)
+    wal.close()
+    assert sorted(CsvLedgerStore(wal.path, **CSV_OPTIONS).read().index) == sorted(ids[1::2])
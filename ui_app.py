@@ -1,10 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
 import os
+import threading
+from collections import OrderedDict
+
+from ledger_budgets import CATEGORIES, BudgetMonitor, Budgets
+from ledger_metrics import enable_from_argv, is_enabled, last_breakdown, operation, phase, timed
+from ledger_queue import WriteBehindLedgerStore
+from ledger_search import LedgerSearch
+from ledger_store import open_store
+from ledger_totals import GRANULARITIES, MONTH_ABBRS, series, year_over_year
+from ledger_watch import LedgerWatcher
+
+# Rendered summaries kept per app window.
+SUMMARY_CACHE_SIZE = 12
+SEARCH_LIMIT = 200
 
 
 # ---------- MAIN APP ----------
@@ -13,6 +24,17 @@ class BudgetTrackerApp:
         self.root = root
         self.username = username.capitalize()
         self.file_path = file_path
+        self.ledger_name = os.path.basename(file_path)
+        # Saves return at once; a worker thread batches them onto disk.
+        self.store = WriteBehindLedgerStore(open_store(file_path), on_error=self._save_failed)
+        self._summaries = OrderedDict()
+        # Summary requests made and the last one shown, so a slow load
+        # never replaces the chart of a later click.
+        self.requested = 0
+        self.shown = 0
+        self._auto = False
+        # Loaded on the first search, off the main thread.
+        self.search = None
 
         self.root.title(f"💰 Hisaab-Kitaab 📖 - {self.username}'s Ledger")
         self.root.geometry("950x850")
@@ -61,21 +83,40 @@ class BudgetTrackerApp:
         # Buttons
         ttk.Button(frame, text="➕ Add Transaction", command=self.add_transaction).grid(row=5, column=0, columnspan=2, pady=10)
         ttk.Button(frame, text="📊 View Summary", command=self.view_summary).grid(row=6, column=0, columnspan=2, pady=5)
+        ttk.Button(frame, text="📈 View Trends", command=self.view_trends).grid(row=7, column=0, columnspan=2, pady=5)
+        ttk.Button(frame, text="🎯 Budgets", command=self.edit_budgets).grid(row=8, column=0, columnspan=2, pady=5)
 
         # --- Month Selection ---
         month_frame = tk.Frame(root, bg="#F5F7FA")
         month_frame.pack(pady=5)
         ttk.Label(month_frame, text="Select Month:", font=("Segoe UI", 10, "bold")).pack(side=tk.LEFT, padx=5)
 
-        months = [datetime(2025, m, 1).strftime("%B") for m in range(1, 13)]
-        self.month_var = tk.StringVar(value=datetime.today().strftime("%B"))
-        self.month_combo = ttk.Combobox(month_frame, textvariable=self.month_var, values=months, state="readonly", width=15)
+        # "November 2025": the year matters, or every November would be mixed.
+        self.month_var = tk.StringVar(value=datetime.today().strftime("%B %Y"))
+        self.month_combo = ttk.Combobox(month_frame, textvariable=self.month_var, state="readonly", width=15,
+                                        postcommand=self._month_choices)
         self.month_combo.pack(side=tk.LEFT, padx=5)
 
+        # --- Search ---
+        search_frame = tk.Frame(root, bg="#F5F7FA")
+        search_frame.pack(pady=5)
+        ttk.Label(search_frame, text="Search:", font=("Segoe UI", 10, "bold")).pack(side=tk.LEFT, padx=5)
+        self.search_entry = ttk.Entry(search_frame, width=30)
+        self.search_entry.pack(side=tk.LEFT, padx=5)
+        self.search_entry.bind("<Return>", self.search_transactions)
+        ttk.Button(search_frame, text="🔍 Search", command=self.search_transactions).pack(side=tk.LEFT, padx=5)
+
         # Message Label
         self.msg_label = tk.Label(root, text="", fg="green", font=("Segoe UI", 10, "italic"), bg="#F5F7FA")
         self.msg_label.pack(pady=5)
 
+        # Timing of the last operations, when profiling is on (HK_PROFILE or --profile)
+        self.status_label = None
+        if is_enabled():
+            self.status_label = tk.Label(root, text="⏱ Profiling on", fg="gray", font=("Segoe UI", 9),
+                                         bg="#F5F7FA", anchor="w")
+            self.status_label.pack(side=tk.BOTTOM, fill="x", padx=10)
+
         # Chart Frame
         self.chart_frame = tk.Frame(root, bg="#F5F7FA")
         self.chart_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -83,19 +124,31 @@ class BudgetTrackerApp:
         # Canvas ref holder
         self.canvas = None
 
+        # Keeps the totals current as this window, the CLI or an import
+        # appends, and refreshes the summary on screen.
+        self.watcher = LedgerWatcher(open_store(file_path), on_change=self._ledger_written)
+        # Budget checks start from the watcher's running totals and count
+        # this window's saves themselves, queued or not.
+        self.budgets = Budgets(file_path)
+        self.monitor = BudgetMonitor(self.budgets, self.watcher)
+        self._month_choices()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
     # -------- Category Options --------
     def update_categories(self, event=None):
         t_type = self.type_var.get()
-        if t_type == "Income":
-            cats = ["Salary", "Investments", "Other"]
-        elif t_type == "Expense":
-            cats = ["Food", "Rent", "Bills", "Entertainment", "Misc"]
-        else:
-            cats = []
+        cats = CATEGORIES.get(t_type.lower(), [])
         self.category_combo['values'] = cats
         if cats:
             self.category_combo.current(0)
 
+    # -------- Month Options --------
+    def _month_choices(self):
+        # Months with transactions, newest first, plus the current one.
+        months = set(self.watcher.rollup("month")) | {datetime.today().strftime("%Y-%m")}
+        self.month_combo['values'] = [datetime.strptime(m, "%Y-%m").strftime("%B %Y")
+                                      for m in sorted(months, reverse=True)]
+
     # -------- Add Transaction --------
     def add_transaction(self):
         t_type = self.type_var.get()
@@ -114,66 +167,345 @@ class BudgetTrackerApp:
             messagebox.showerror("❌ Error", "Amount must be numeric!")
             return
 
-        new_entry = pd.DataFrame([[t_type.lower(), category, amount, date, desc]],
-                                 columns=["type", "category", "amount", "date", "description"])
-        new_entry.to_csv(self.file_path, mode='a', header=not os.path.exists(self.file_path), index=False)
+        row = {"type": t_type.lower(), "category": category, "amount": amount,
+               "date": date, "description": desc}
+        alert = self.monitor.add(row)
+        self.store.append(row)
 
         self.msg_label.config(text=f"✅ {t_type} added: ₹{amount:.2f} under {category}")
         self.amount_entry.delete(0, tk.END)
         self.desc_entry.delete(0, tk.END)
+        if alert is not None:
+            if alert.over:
+                messagebox.showwarning("🚨 Over Budget", str(alert))
+            else:
+                self.msg_label.config(text=f"{self.msg_label.cget('text')}\n{alert}")
+
+    # -------- Budgets --------
+    def edit_budgets(self):
+        window = tk.Toplevel(self.root)
+        window.title(f"🎯 {self.username}'s Monthly Budgets")
+        window.configure(bg="#F5F7FA")
+        month = datetime.today().strftime("%Y-%m")
+        limits = self.budgets.limits()
+        entries = {}
+        for i, category in enumerate(CATEGORIES["expense"]):
+            ttk.Label(window, text=f"{category}:", font=("Segoe UI", 10, "bold")).grid(row=i, column=0, padx=10,
+                                                                                     pady=3, sticky="w")
+            entry = ttk.Entry(window, width=12)
+            if category in limits:
+                entry.insert(0, f"{limits[category]:.2f}")
+            entry.grid(row=i, column=1, padx=10)
+            spent = self.monitor.spent(month, category)
+            tk.Label(window, text=f"₹{spent:,.2f} spent this month", fg="gray", bg="#F5F7FA",
+                     font=("Segoe UI", 9)).grid(row=i, column=2, padx=10, sticky="w")
+            entries[category] = entry
+
+        def save():
+            try:
+                changes = {category: float(entry.get() or 0) for category, entry in entries.items()}
+            except ValueError:
+                messagebox.showerror("❌ Error", "Budgets must be numeric!", parent=window)
+                return
+            self.budgets.set_limits(changes)
+            self.msg_label.config(text="✅ Budgets saved")
+            window.destroy()
+
+        ttk.Button(window, text="💾 Save Budgets", command=save).grid(row=len(entries), column=0, columnspan=3,
+                                                                     pady=10)
 
     # -------- View Summary with Pie Chart --------
-    def view_summary(self):
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
-
-        if not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0:
-            messagebox.showinfo("📂 No Data", "No transactions yet!")
-            return
-
-        df = pd.read_csv(self.file_path)
-        if df.empty:
-            messagebox.showinfo("📂 No Data", "No transactions yet!")
+    # Loading, aggregating and laying out the chart run on a worker thread;
+    # results come back through root.after, since only the main thread may
+    # touch Tk. Summaries are cached per (watcher fingerprint, month): it
+    # moves on every write the watcher folds in, so entries for an older
+    # version are dropped as soon as a newer one is cached.
+    def view_summary(self, auto=False):
+        selected_month = self.month_var.get()
+        key = (self.watcher.fingerprint(), selected_month)
+        self.requested += 1
+        self._auto = auto
+        if key in self._summaries:
+            self._summaries.move_to_end(key)
+            self._show_summary(self.requested, key, self._summaries[key])
             return
+        self.msg_label.config(text=f"⏳ Loading {selected_month} summary…")
+        threading.Thread(target=self._profiled, args=("summary", self._build_summary, self.requested, key),
+                         daemon=True).start()
+
+    def _build_summary(self, request, key):
+        selected_month = key[1]
+        # Totals come from the watcher's in-memory aggregates, which it
+        # guards against its own updates.
+        try:
+            if self.watcher.is_empty():
+                summary = {"message": ("📂 No Data", "No transactions yet!")}
+            else:
+                period = datetime.strptime(selected_month, "%B %Y").strftime("%Y-%m")
+                with timed("aggregate"):
+                    month = self.watcher.rollup("month").get(period, {})
+                    totals = {t_type: sum(categories.values()) for t_type, categories in month.items()}
+                    exp_totals = month.get('expense', {})
+                summary = None if totals else {"message": ("📅 No Data", f"No transactions for {selected_month}")}
+        except (OSError, ValueError) as exc:
+            summary = {"message": ("❌ Error", f"Could not read the ledger: {exc}")}
+
+        if summary is None:
+            total_income = totals.get('income', 0.0)
+            total_expense = totals.get('expense', 0.0)
+            balance = total_income - total_expense
+            summary = {
+                "text": f"📅 {selected_month} Summary:\n💰 Income: ₹{total_income:.2f} | 💸 Expense: ₹{total_expense:.2f} | 💵 Balance: ₹{balance:.2f}",
+                "figure": self._expense_pie(selected_month, exp_totals) if exp_totals else None,
+            }
+        self.root.after(0, self._show_summary, request, key, summary)
+
+    @staticmethod
+    @phase("render")
+    def _expense_pie(selected_month, exp_totals):
+        # A bare Figure rather than pyplot: pyplot keeps every figure alive
+        # until it is closed, and is not safe off the main thread.
+        from matplotlib.figure import Figure
+
+        labels, amounts = zip(*sorted(exp_totals.items()))
+        total = sum(amounts)
+        fig = Figure(figsize=(5, 5))
+        ax = fig.add_subplot()
+        wedges, texts, autotexts = ax.pie(amounts, labels=labels,
+                                          autopct=lambda pct: f"{pct:.1f}%\n(₹{pct/100*total:.0f})",
+                                          startangle=90, textprops={"fontsize": 9})
+        ax.set_title(f"{selected_month} - Expense Breakdown 💹", fontsize=12)
+        fig.tight_layout()
+        return fig
+
+    def _cache_summary(self, key, summary):
+        shown = self.canvas.figure if self.canvas is not None else None
+        for old in [k for k in self._summaries if k[0] != key[0]]:
+            self._close_figure(self._summaries.pop(old), shown)
+        self._summaries[key] = summary
+        while len(self._summaries) > SUMMARY_CACHE_SIZE:
+            self._close_figure(self._summaries.popitem(last=False)[1], shown)
+
+    @staticmethod
+    def _close_figure(summary, shown):
+        figure = summary.get("figure")
+        if figure is not None and figure is not shown:
+            figure.clear()
+
+    def _show_summary(self, request, key, summary):
+        if key not in self._summaries:
+            self._cache_summary(key, summary)
+        if request != self.requested:
+            return  # a later click is still loading; its result will be shown
+        self.shown = request
+        self.msg_label.config(text="")
 
-        # Filter by selected month
-        selected_month = self.month_var.get()
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
-        df['month_name'] = df['date'].dt.strftime("%B")
-        month_df = df[df['month_name'] == selected_month]
+        for widget in self.chart_frame.winfo_children():
+            widget.destroy()
+        self.canvas = None
 
-        if month_df.empty:
-            messagebox.showinfo("📅 No Data", f"No transactions for {selected_month}")
+        if "message" in summary:
+            if self._auto:
+                # No pop-ups for refreshes the user did not ask for.
+                tk.Label(self.chart_frame, text=summary["message"][1],
+                         fg="gray", bg="#F5F7FA", font=("Segoe UI", 10)).pack(pady=20)
+            else:
+                messagebox.showinfo(*summary["message"])
             return
 
-        total_income = month_df[month_df['type'] == 'income']['amount'].sum()
-        total_expense = month_df[month_df['type'] == 'expense']['amount'].sum()
-        balance = total_income - total_expense
-
-        summary_text = f"📅 {selected_month} Summary:\n💰 Income: ₹{total_income:.2f} | 💸 Expense: ₹{total_expense:.2f} | 💵 Balance: ₹{balance:.2f}"
-        summary_label = tk.Label(self.chart_frame, text=summary_text, font=("Segoe UI", 11, "bold"),
+        summary_label = tk.Label(self.chart_frame, text=summary["text"], font=("Segoe UI", 11, "bold"),
                                  fg="#2C3E50", bg="#F5F7FA")
         summary_label.pack(pady=10)
 
-        # Category-wise Expense Breakdown
-        exp_df = month_df[month_df['type'] == 'expense'].groupby('category')['amount'].sum()
-
-        if not exp_df.empty:
-            fig, ax = plt.subplots(figsize=(5, 5))
-            wedges, texts, autotexts = ax.pie(exp_df, labels=exp_df.index,
-                                              autopct=lambda pct: f"{pct:.1f}%\n(₹{pct/100*exp_df.sum():.0f})",
-                                              startangle=90, textprops={"fontsize": 9})
-            ax.set_title(f"{selected_month} - Expense Breakdown 💹", fontsize=12)
-            plt.tight_layout()
+        if summary["figure"] is not None:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
             # Embed in Tkinter
-            self.canvas = FigureCanvasTkAgg(fig, master=self.chart_frame)
-            self.canvas.draw()
-            self.canvas.get_tk_widget().pack(pady=10)
+            with operation("summary.draw", self.ledger_name), timed("render"):
+                self.canvas = FigureCanvasTkAgg(summary["figure"], master=self.chart_frame)
+                self.canvas.draw()
+                self.canvas.get_tk_widget().pack(pady=10)
         else:
             tk.Label(self.chart_frame, text="No expense data for this month!",
                      fg="gray", bg="#F5F7FA", font=("Segoe UI", 10)).pack(pady=20)
+        self._show_timing("summary", "summary.draw")
+
+    # -------- Trends --------
+    # Charts come from the watcher's rollups, which it keeps per day, week,
+    # month and year as rows arrive, so nothing is re-aggregated. Figures
+    # are built on a worker thread, as summaries are.
+    def view_trends(self):
+        window = tk.Toplevel(self.root)
+        window.title(f"📈 {self.username}'s Trends")
+        window.configure(bg="#F5F7FA")
+        controls = tk.Frame(window, bg="#F5F7FA")
+        controls.pack(pady=5)
+        ttk.Label(controls, text="Trend by:", font=("Segoe UI", 10, "bold")).pack(side=tk.LEFT, padx=5)
+        by_var = tk.StringVar(value="Month")
+        by_combo = ttk.Combobox(controls, textvariable=by_var, values=[g.capitalize() for g in GRANULARITIES],
+                                state="readonly", width=10)
+        by_combo.pack(side=tk.LEFT, padx=5)
+        chart = tk.Frame(window, bg="#F5F7FA")
+        chart.pack(fill="both", expand=True, padx=10, pady=10)
+
+        def load(event=None):
+            threading.Thread(target=self._profiled, args=("trends", self._build_trends, chart, by_var.get().lower()),
+                             daemon=True).start()
+
+        by_combo.bind("<<ComboboxSelected>>", load)
+        load()
+
+    def _build_trends(self, chart, granularity):
+        try:
+            with timed("aggregate"):
+                rollup = self.watcher.rollup(granularity)
+                month_rollup = self.watcher.rollup("month")
+            figure = self._trend_figure(granularity, rollup, month_rollup) if rollup else None
+            message = None if rollup else "No dated transactions yet!"
+        except (OSError, ValueError) as exc:
+            figure, message = None, f"Could not read the ledger: {exc}"
+        try:
+            self.root.after(0, self._show_trends, chart, figure, message)
+        except (RuntimeError, tk.TclError):
+            pass  # the window is gone
+
+    @staticmethod
+    @phase("render")
+    def _trend_figure(granularity, rollup, month_rollup):
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(8, 7))
+        trend, yoy = fig.subplots(2, 1)
+        periods = list(rollup)
+        for t_type, color in (("income", "#27AE60"), ("expense", "#C0392B")):
+            trend.plot(range(len(periods)), list(series(rollup, t_type).values()), color=color,
+                       marker="o" if len(periods) <= 60 else None, label=t_type.capitalize())
+        step = max(1, len(periods) // 12)
+        trend.set_xticks(range(0, len(periods), step))
+        trend.set_xticklabels(periods[::step], rotation=45, ha="right", fontsize=8)
+        trend.set_title(f"Income & Expense by {granularity.capitalize()} 📈", fontsize=12)
+        trend.legend(fontsize=8)
+
+        years = year_over_year(month_rollup, "expense")
+        width = 0.8 / max(1, len(years))
+        for i, (year, amounts) in enumerate(years.items()):
+            yoy.bar([m + i * width for m in range(12)], amounts, width=width, label=year)
+        yoy.set_xticks([m + width * (len(years) - 1) / 2 for m in range(12)])
+        yoy.set_xticklabels(MONTH_ABBRS, fontsize=8)
+        yoy.set_title("Expense, Year over Year 💹", fontsize=12)
+        yoy.legend(fontsize=8)
+        fig.tight_layout()
+        return fig
+
+    def _show_trends(self, chart, figure, message):
+        if not chart.winfo_exists():
+            return  # closed while it loaded
+        for widget in chart.winfo_children():
+            widget.destroy()
+        if figure is None:
+            tk.Label(chart, text=message, fg="gray", bg="#F5F7FA", font=("Segoe UI", 10)).pack(pady=20)
+            return
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        with operation("trends.draw", self.ledger_name), timed("render"):
+            canvas = FigureCanvasTkAgg(figure, master=chart)
+            canvas.draw()
+            canvas.get_tk_widget().pack(fill="both", expand=True)
+        self._show_timing("trends", "trends.draw")
+
+    # -------- Search --------
+    # The index catches up on a worker thread (the rows appended since the
+    # last search, or one full read after a rewrite); hits come back
+    # through root.after like summaries do.
+    def search_transactions(self, event=None):
+        query = self.search_entry.get().strip()
+        if not query:
+            return
+        self.msg_label.config(text=f"⏳ Searching for \"{query}\"…")
+        threading.Thread(target=self._profiled, args=("search", self._run_search, query), daemon=True).start()
+
+    def _run_search(self, query):
+        if self.search is None:
+            # On the ledger itself, so CSV ledgers keep their index sidecar.
+            self.search = LedgerSearch(self.store.base)
+        self.store.flush()
+        self.search.refresh()
+        rows = self.search.search(query, limit=SEARCH_LIMIT)
+        try:
+            self.root.after(0, self._show_search, query, rows)
+        except (RuntimeError, tk.TclError):
+            pass  # the window is gone
+
+    def _show_search(self, query, rows):
+        self.msg_label.config(text=f"🔍 {len(rows)} match(es) for \"{query}\"")
+        if not rows:
+            return
+        window = tk.Toplevel(self.root)
+        window.title(f"🔍 {query}")
+        columns = (("date", 90), ("type", 70), ("category", 100), ("amount", 90), ("description", 300))
+        tree = ttk.Treeview(window, columns=[name for name, _ in columns], show="headings", height=15)
+        for name, width in columns:
+            tree.heading(name, text=name.capitalize())
+            tree.column(name, width=width, anchor=tk.E if name == "amount" else tk.W)
+        for row in rows:
+            tree.insert("", tk.END, values=(row["date"].isoformat() if row["date"] else "?", row["type"].capitalize(),
+                                            row["category"], f"₹{row['amount']:,.2f}", row["description"]))
+        tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+    # -------- Live Refresh --------
+    def _ledger_written(self):
+        # Watcher thread: hand over to Tk.
+        try:
+            self.root.after(0, self._refresh_summary)
+        except (RuntimeError, tk.TclError):
+            self.watcher.stop()  # the window is gone
+
+    def _refresh_summary(self):
+        # Once the watcher has folded in every row this window saved, its
+        # totals also hold other writers' rows: budget checks start over from them.
+        if not self.store.pending() and self.watcher.fingerprint() == self.watcher.store.fingerprint():
+            self.monitor.reset()
+        self._show_timing("save")
+        if self.shown:
+            self.view_summary(auto=True)
+
+    # -------- Profiling --------
+    def _profiled(self, name, fn, *args):
+        # Worker threads run as one operation, so their phases add up per summary, chart or search.
+        with operation(name, self.ledger_name):
+            fn(*args)
+        try:
+            # The result may have been shown before the operation ended.
+            self.root.after(0, self._show_timing, name, f"{name}.draw")
+        except (RuntimeError, tk.TclError):
+            pass  # the window is gone
+
+    def _show_timing(self, *names):
+        if self.status_label is None:
+            return
+        breakdowns = [str(b) for b in map(last_breakdown, names) if b is not None]
+        if breakdowns:
+            self.status_label.config(text=" | ".join(breakdowns))
+
+    # -------- Saving --------
+    def _save_failed(self, exc):
+        # Write-behind thread. Rows that failed with an OSError stay queued
+        # and are retried; any other failure dropped them.
+        if isinstance(exc, OSError):
+            text = f"⚠️ Could not save yet, retrying: {exc}"
+        else:
+            text = f"❌ {len(self.store.failed)} transactions could not be saved: {exc}"
+        try:
+            self.root.after(0, lambda: self.msg_label.config(text=text))
+        except (RuntimeError, tk.TclError):
+            pass
+
+    def close(self):
+        self.watcher.stop()
+        if not self.store.close(timeout=5):
+            messagebox.showerror("❌ Error", f"{self.store.pending()} transactions could not be saved: "
+                                           f"{self.store.error}")
+        self.root.destroy()
 
 
 # ---------- LOGIN SCREEN ----------
@@ -204,9 +536,9 @@ class LoginScreen:
         os.makedirs(data_dir, exist_ok=True)
         file_path = os.path.join(data_dir, f"{username}_transactions.csv")
 
-        if not os.path.exists(file_path):
-            df = pd.DataFrame(columns=["type", "category", "amount", "date", "description"])
-            df.to_csv(file_path, index=False)
+        store = open_store(file_path)
+        if not os.path.exists(store.path):
+            store.ensure()
             messagebox.showinfo("🆕 Account Created", f"Welcome {username.capitalize()}! Your ledger is ready.")
         else:
             messagebox.showinfo("👋 Welcome Back", f"Welcome back, {username.capitalize()}!")
@@ -219,6 +551,7 @@ class LoginScreen:
 
 # ---------- RUN APP ----------
 if __name__ == "__main__":
+    enable_from_argv()
     root = tk.Tk()
     LoginScreen(root)
     root.mainloop()